@@ -6,9 +6,6 @@ from logging.config import fileConfig
 # 👇 Add project root to sys.path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, project_root)
-print("sys.path = ", sys.path)
-import importlib.util
-print("models.py found:", importlib.util.find_spec("app.models") is not None)
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from app import models  # 🔁 Import all models explicitly
@@ -1,7 +1,7 @@
 """Add user_id to expenses
 
 Revision ID: 08adbcaa1985
-Revises: 
+Revises: 1a6e0c93d7f4
 Create Date: 2025-07-07 17:08:12.193062
 
 """
@@ -13,30 +13,27 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = '08adbcaa1985'
-down_revision: Union[str, Sequence[str], None] = None
+down_revision: Union[str, Sequence[str], None] = '1a6e0c93d7f4'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
     """Upgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.add_column('expenses', sa.Column('user_id', sa.Integer(), nullable=True))
-    op.create_foreign_key(None, 'expenses', 'users', ['user_id'], ['id'])
-    op.add_column('incomes', sa.Column('user_id', sa.Integer(), nullable=True))
-    op.create_foreign_key(None, 'incomes', 'users', ['user_id'], ['id'])
-    op.add_column('savings', sa.Column('user_id', sa.Integer(), nullable=True))
-    op.create_foreign_key(None, 'savings', 'users', ['user_id'], ['id'])
-    # ### end Alembic commands ###
+    # Databases bootstrapped by the old create_all already have user_id and its foreign key
+    inspector = sa.inspect(op.get_bind())
+    for table in ('expenses', 'incomes', 'savings'):
+        columns = {column['name'] for column in inspector.get_columns(table)}
+        if 'user_id' not in columns:
+            op.add_column(table, sa.Column('user_id', sa.Integer(), nullable=True))
+        foreign_keys = inspector.get_foreign_keys(table)
+        if not any(fk['constrained_columns'] == ['user_id'] and fk['referred_table'] == 'users' for fk in foreign_keys):
+            op.create_foreign_key(f'{table}_user_id_fkey', table, 'users', ['user_id'], ['id'])
 
 
 def downgrade() -> None:
     """Downgrade schema."""
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_constraint(None, 'savings', type_='foreignkey')
-    op.drop_column('savings', 'user_id')
-    op.drop_constraint(None, 'incomes', type_='foreignkey')
-    op.drop_column('incomes', 'user_id')
-    op.drop_constraint(None, 'expenses', type_='foreignkey')
-    op.drop_column('expenses', 'user_id')
-    # ### end Alembic commands ###
+    # the names Postgres gives the create_all foreign keys, reused by upgrade()
+    for table in ('savings', 'incomes', 'expenses'):
+        op.drop_constraint(f'{table}_user_id_fkey', table, type_='foreignkey')
+        op.drop_column(table, 'user_id')
@@ -0,0 +1,68 @@
+"""Initial schema (tables that used to be created by create_all at import time)
+
+Revision ID: 1a6e0c93d7f4
+Revises: 
+Create Date: 2025-07-01 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1a6e0c93d7f4'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped by the old create_all already have these tables; leave them alone
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(), nullable=False),
+            sa.Column('email', sa.String(), nullable=False),
+            sa.Column('password', sa.String(), nullable=False),
+            sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email'),
+            sa.UniqueConstraint('username'),
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+
+    if 'expenses' not in existing:
+        op.create_table(
+            'expenses',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('Note', sa.String(), nullable=True),
+            sa.Column('amount', sa.Float(), nullable=False),
+            sa.Column('category', sa.String(), nullable=False),
+            sa.Column('timestamp', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_expenses_id', 'expenses', ['id'])
+
+    for table in ('incomes', 'savings'):
+        if table not in existing:
+            op.create_table(
+                table,
+                sa.Column('id', sa.Integer(), nullable=False),
+                sa.Column('amount', sa.Float(), nullable=False),
+                sa.Column('note', sa.String(), nullable=True),
+                sa.Column('timestamp', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+                sa.PrimaryKeyConstraint('id'),
+            )
+            op.create_index(f'ix_{table}_id', table, ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ('savings', 'incomes', 'expenses', 'users'):
+        op.drop_table(table)
@@ -0,0 +1,60 @@
+"""Add monthly_rollups and backfill from the ledger tables
+
+Revision ID: 3f9c2a7d4b10
+Revises: 08adbcaa1985
+Create Date: 2025-07-21 10:12:41.508233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a7d4b10'
+down_revision: Union[str, Sequence[str], None] = '08adbcaa1985'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'monthly_rollups',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('income', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('expense', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('saving', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('entries', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'month'),
+    )
+
+    # Backfill: one grouped pass over the three ledgers
+    op.execute(
+        """
+        INSERT INTO monthly_rollups (user_id, month, income, expense, saving, entries)
+        SELECT user_id, month, SUM(income), SUM(expense), SUM(saving), COUNT(*)
+        FROM (
+            SELECT user_id, date_trunc('month', timestamp)::date AS month,
+                   amount AS income, 0.0 AS expense, 0.0 AS saving
+            FROM incomes WHERE user_id IS NOT NULL
+            UNION ALL
+            SELECT user_id, date_trunc('month', timestamp)::date,
+                   0.0, amount, 0.0
+            FROM expenses WHERE user_id IS NOT NULL
+            UNION ALL
+            SELECT user_id, date_trunc('month', timestamp)::date,
+                   0.0, 0.0, amount
+            FROM savings WHERE user_id IS NOT NULL
+        ) AS ledger
+        GROUP BY user_id, month
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('monthly_rollups')
@@ -0,0 +1,47 @@
+"""Add balance_snapshots and backfill from the ledger tables
+
+Revision ID: 7b1e4d02c9a3
+Revises: 3f9c2a7d4b10
+Create Date: 2025-07-22 09:41:05.117302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b1e4d02c9a3'
+down_revision: Union[str, Sequence[str], None] = '3f9c2a7d4b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'balance_snapshots',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('total_income', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('total_expense', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('total_saving', sa.Float(), server_default=sa.text('0'), nullable=False),
+        sa.Column('version', sa.Integer(), server_default=sa.text('0'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+
+    # Backfill from the monthly rollups, which already hold the per-user sums
+    op.execute(
+        """
+        INSERT INTO balance_snapshots (user_id, total_income, total_expense, total_saving, version)
+        SELECT user_id, SUM(income), SUM(expense), SUM(saving), 1
+        FROM monthly_rollups
+        GROUP BY user_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('balance_snapshots')
@@ -0,0 +1,68 @@
+"""Add full-text and trigram indexes on expense and income notes
+
+Revision ID: a9d3e6f2c8b4
+Revises: f7b2c9d4e1a5
+Create Date: 2025-08-18 16:12:45.530917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d3e6f2c8b4'
+down_revision: Union[str, Sequence[str], None] = 'f7b2c9d4e1a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, index definition after USING); the tsvector expression must stay identical
+# to app.models.note_tsvector() or the planner won't use the index
+INDEXES = [
+    ('ix_expenses_note_tsv', 'expenses', """gin (to_tsvector('simple', coalesce("Note", '')))"""),
+    ('ix_expenses_note_trgm', 'expenses', 'gin ("Note" gin_trgm_ops)'),
+    ('ix_incomes_note_tsv', 'incomes', """gin (to_tsvector('simple', coalesce("note", '')))"""),
+    ('ix_incomes_note_trgm', 'incomes', 'gin ("note" gin_trgm_ops)'),
+]
+
+
+def _partitions(bind, table):
+    return bind.execute(
+        sa.text('SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = CAST(:table AS regclass)'),
+        {'table': table},
+    ).scalars().all()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return  # other databases search through the in-process index in app/search.py
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # Build without locking out writes. A partitioned parent can't be indexed CONCURRENTLY, so its
+    # index is created ON ONLY the parent (invalid until complete), each partition is indexed
+    # concurrently and attached, which makes the parent index valid.
+    with op.get_context().autocommit_block():
+        for name, table, definition in INDEXES:
+            partitions = _partitions(bind, table)
+            if not partitions:
+                op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" USING {definition}')
+                continue
+            op.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON ONLY "{table}" USING {definition}')
+            for partition in partitions:
+                partition_index = f'{partition}_{name[len("ix_" + table) + 1:]}_idx'
+                op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{partition_index}" ON "{partition}" USING {definition}')
+                op.execute(f'ALTER INDEX "{name}" ATTACH PARTITION "{partition_index}"')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    # dropping a partitioned index drops the partitions' indexes with it
+    for name, _, _ in reversed(INDEXES):
+        op.execute(f'DROP INDEX IF EXISTS "{name}"')
@@ -0,0 +1,41 @@
+"""Add per-user time-range indexes on the ledger tables
+
+Revision ID: c4a81e5f2d67
+Revises: 7b1e4d02c9a3
+Create Date: 2025-07-24 14:03:52.771940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a81e5f2d67'
+down_revision: Union[str, Sequence[str], None] = '7b1e4d02c9a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns)
+INDEXES = [
+    ('ix_expenses_user_id_timestamp', 'expenses', ['user_id', 'timestamp', 'id']),
+    ('ix_expenses_user_id_category_timestamp', 'expenses', ['user_id', 'category', 'timestamp']),
+    ('ix_incomes_user_id_timestamp', 'incomes', ['user_id', 'timestamp', 'id']),
+    ('ix_savings_user_id_timestamp', 'savings', ['user_id', 'timestamp', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction and does not lock out writes
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,134 @@
+"""Partition expenses, incomes and savings by month on timestamp
+
+Revision ID: e2d5f8a1b396
+Revises: c4a81e5f2d67
+Create Date: 2025-08-04 10:21:37.402118
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app import partitions
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2d5f8a1b396'
+down_revision: Union[str, Sequence[str], None] = 'c4a81e5f2d67'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# column definitions per table, in the existing column order
+COLUMNS = {
+    'expenses': '''
+        "id" integer NOT NULL DEFAULT nextval('expenses_id_seq'::regclass),
+        "Note" varchar,
+        "amount" double precision NOT NULL,
+        "category" varchar NOT NULL,
+        "timestamp" timestamp with time zone NOT NULL DEFAULT now(),
+        "user_id" integer REFERENCES users (id)
+    ''',
+    'incomes': '''
+        "id" integer NOT NULL DEFAULT nextval('incomes_id_seq'::regclass),
+        "amount" double precision NOT NULL,
+        "note" varchar,
+        "timestamp" timestamp with time zone NOT NULL DEFAULT now(),
+        "user_id" integer REFERENCES users (id)
+    ''',
+    'savings': '''
+        "id" integer NOT NULL DEFAULT nextval('savings_id_seq'::regclass),
+        "amount" double precision NOT NULL,
+        "note" varchar,
+        "timestamp" timestamp with time zone NOT NULL DEFAULT now(),
+        "user_id" integer REFERENCES users (id)
+    ''',
+}
+
+# (index name, table, columns): the indexes of c4a81e5f2d67 plus the original ix_<table>_id
+INDEXES = [
+    ('ix_expenses_id', 'expenses', ['id']),
+    ('ix_expenses_user_id_timestamp', 'expenses', ['user_id', 'timestamp', 'id']),
+    ('ix_expenses_user_id_category_timestamp', 'expenses', ['user_id', 'category', 'timestamp']),
+    ('ix_incomes_id', 'incomes', ['id']),
+    ('ix_incomes_user_id_timestamp', 'incomes', ['user_id', 'timestamp', 'id']),
+    ('ix_savings_id', 'savings', ['id']),
+    ('ix_savings_user_id_timestamp', 'savings', ['user_id', 'timestamp', 'id']),
+]
+
+
+def _column_list(table):
+    return ', '.join(line.split()[0] for line in COLUMNS[table].strip().splitlines())
+
+
+def _retire(table):
+    """Rename `table` out of the way, freeing its sequence, constraint and index names."""
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY NONE')
+    op.execute(f'ALTER TABLE "{table}" RENAME TO "{table}_old"')
+    op.execute(f'ALTER TABLE "{table}_old" RENAME CONSTRAINT "{table}_pkey" TO "{table}_old_pkey"')
+    for name, index_table, _ in INDEXES:
+        if index_table == table:
+            op.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+def _finish(table):
+    """Copy the rows over from the retired table, drop it and hand the sequence to the new one."""
+    columns = _column_list(table)
+    op.execute(f'INSERT INTO "{table}" ({columns}) SELECT {columns} FROM "{table}_old"')
+    op.execute(f'DROP TABLE "{table}_old"')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY "{table}".id')
+    op.execute(f'ANALYZE "{table}"')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return  # declarative partitioning is Postgres-only; other databases keep plain tables
+
+    # This rewrites every ledger row and holds an exclusive lock on the tables until it commits:
+    # run it in a maintenance window on large databases.
+    for table in partitions.PARTITIONED_TABLES:
+        if partitions.is_partitioned(bind, table):
+            continue
+        first = bind.execute(sa.text(f'SELECT min("timestamp") FROM "{table}"')).scalar()
+
+        _retire(table)
+        # A partitioned table's primary key must include the partition key
+        op.execute(
+            f'CREATE TABLE "{table}" ({COLUMNS[table]}, '
+            f'CONSTRAINT "{table}_pkey" PRIMARY KEY ("id", "timestamp")) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        op.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+        for name, index_table, columns in INDEXES:
+            if index_table == table:
+                op.create_index(name, table, columns)
+
+        this_month = partitions.month_floor(datetime.now(timezone.utc))
+        partitions.ensure_partitions(
+            bind,
+            partitions.month_floor(first) if first else this_month,
+            partitions.add_months(this_month, partitions.PARTITION_MONTHS_AHEAD),
+            tables=(table,),
+        )
+        _finish(table)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    for table in reversed(partitions.PARTITIONED_TABLES):
+        if not partitions.is_partitioned(bind, table):
+            continue
+        _retire(table)
+        op.execute(f'CREATE TABLE "{table}" ({COLUMNS[table]}, CONSTRAINT "{table}_pkey" PRIMARY KEY ("id"))')
+        for name, index_table, columns in INDEXES:
+            if index_table == table:
+                op.create_index(name, table, columns)
+        # dropping the partitioned parent drops all of its partitions
+        _finish(table)
@@ -0,0 +1,149 @@
+"""Dictionary-encode expense categories into a per-user categories table
+
+Revision ID: f7b2c9d4e1a5
+Revises: e2d5f8a1b396
+Create Date: 2025-08-11 09:47:03.118452
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7b2c9d4e1a5'
+down_revision: Union[str, Sequence[str], None] = 'e2d5f8a1b396'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# expenses rows whose category_id is filled in per UPDATE (and per commit), by id range
+BACKFILL_BATCH_SIZE = 10000
+
+INDEX_NAME = 'ix_expenses_user_id_category_id_timestamp'
+INDEX_COLUMNS = ['user_id', 'category_id', 'timestamp']
+FK_NAME = 'expenses_user_id_category_id_fkey'
+
+
+def _partitions(bind, table):
+    return bind.execute(
+        sa.text('SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = CAST(:table AS regclass)'),
+        {'table': table},
+    ).scalars().all()
+
+
+def _backfill_category_ids(bind):
+    # One short transaction per batch, so no lock on expenses is held for the whole backfill
+    low, high = bind.execute(sa.text('SELECT min(id), max(id) FROM expenses')).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, BACKFILL_BATCH_SIZE):
+        bind.execute(
+            sa.text(
+                """
+                UPDATE expenses AS e
+                SET category_id = c.id
+                FROM categories AS c
+                WHERE e.id >= :start AND e.id < :stop
+                  AND c.user_id = e.user_id AND c.name = e.category
+                """
+            ),
+            {'start': start, 'stop': start + BACKFILL_BATCH_SIZE},
+        )
+
+
+def _create_index(bind):
+    # A partitioned parent can't be indexed CONCURRENTLY: index it ON ONLY (invalid until
+    # complete), build each partition's index concurrently and attach it, which makes it valid
+    partitions = _partitions(bind, 'expenses')
+    if not partitions:
+        op.create_index(INDEX_NAME, 'expenses', INDEX_COLUMNS, postgresql_concurrently=True, if_not_exists=True)
+        return
+    columns = ', '.join(f'"{column}"' for column in INDEX_COLUMNS)
+    op.execute(f'CREATE INDEX IF NOT EXISTS "{INDEX_NAME}" ON ONLY expenses ({columns})')
+    for partition in partitions:
+        partition_index = f'{partition}_user_id_category_id_timestamp_idx'
+        op.create_index(partition_index, partition, INDEX_COLUMNS, postgresql_concurrently=True, if_not_exists=True)
+        op.execute(f'ALTER INDEX "{INDEX_NAME}" ATTACH PARTITION "{partition_index}"')
+
+
+def _add_foreign_key(bind):
+    # NOT VALID skips the scan under a write-blocking lock; VALIDATE then scans without blocking
+    # writes. Partitioned tables don't accept NOT VALID foreign keys, so each partition gets a
+    # validated one first and the parent's constraint takes those over instead of re-checking.
+    partitions = _partitions(bind, 'expenses')
+    for table in partitions or ['expenses']:
+        name = f'{table}_user_id_category_id_fkey'
+        op.execute(
+            f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" FOREIGN KEY (user_id, category_id) '
+            f'REFERENCES categories (user_id, id) NOT VALID'
+        )
+        op.execute(f'ALTER TABLE "{table}" VALIDATE CONSTRAINT "{name}"')
+    if partitions:
+        op.create_foreign_key(FK_NAME, 'expenses', 'categories', ['user_id', 'category_id'], ['user_id', 'id'])
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    op.create_table(
+        'categories',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('id', sa.SmallInteger(), autoincrement=False, nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'id'),
+        sa.UniqueConstraint('user_id', 'name', name='uq_categories_user_id_name'),
+    )
+
+    # Backfill: number each user's distinct category names in order of first use
+    op.execute(
+        """
+        INSERT INTO categories (user_id, id, name)
+        SELECT user_id,
+               ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY MIN(timestamp), category),
+               category
+        FROM expenses
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id, category
+        """
+    )
+
+    op.add_column('expenses', sa.Column('category_id', sa.SmallInteger(), nullable=True))
+    op.drop_index('ix_expenses_user_id_category_timestamp', table_name='expenses', if_exists=True)
+
+    # Rows without a user (from before 08adbcaa1985) can't be reached through the API; they keep a NULL id
+    if bind.dialect.name == 'postgresql':
+        # Follows the online rules of c4a81e5f2d67: batched backfill, concurrent index build
+        with op.get_context().autocommit_block():
+            _backfill_category_ids(bind)
+            _create_index(bind)
+            _add_foreign_key(bind)
+    else:
+        _backfill_category_ids(bind)
+        op.create_index(INDEX_NAME, 'expenses', INDEX_COLUMNS)
+        op.create_foreign_key(FK_NAME, 'expenses', 'categories', ['user_id', 'category_id'], ['user_id', 'id'])
+
+    op.drop_column('expenses', 'category')
+    op.execute('ANALYZE expenses')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('expenses', sa.Column('category', sa.String(), nullable=True))
+    op.execute(
+        """
+        UPDATE expenses AS e
+        SET category = c.name
+        FROM categories AS c
+        WHERE c.user_id = e.user_id AND c.id = e.category_id
+        """
+    )
+    op.execute("UPDATE expenses SET category = '' WHERE category IS NULL")
+    op.alter_column('expenses', 'category', nullable=False)
+
+    op.drop_constraint(FK_NAME, 'expenses', type_='foreignkey')
+    op.drop_index(INDEX_NAME, table_name='expenses')
+    op.create_index('ix_expenses_user_id_category_timestamp', 'expenses', ['user_id', 'category', 'timestamp'])
+    op.drop_column('expenses', 'category_id')
+    op.drop_table('categories')
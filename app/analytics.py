@@ -0,0 +1,236 @@
+# analytics.py
+# Time-series views over one ledger of one user.
+#
+# The database does the heavy part: one GROUP BY over the (user_id, timestamp) index that returns
+# a (bucket, total, count) row per non-empty day/week/month. Everything derived from those columns
+# (filling empty buckets, rolling means, running totals, period-over-period deltas) is computed
+# with NumPy over whole arrays, so a five-year daily series is a few array operations on ~1800
+# values rather than a Python loop. NumPy is imported on first use, not when the app starts.
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Expense, Income, Saving
+
+BUCKETS = ("day", "week", "month")
+
+# metric -> ledger model
+METRICS = {
+    "expense": Expense,
+    "income": Income,
+    "saving": Saving,
+}
+
+# buckets in one series; a day-level series over ten years is ~3650
+MAX_BUCKETS = 5000
+
+
+def as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def bucket_start(bucket: str, day: date) -> date:
+    """
+    First day of the bucket containing `day`; weeks start on Monday, like date_trunc('week').
+    """
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _bucket_column(dialect_name: str, bucket: str, column):
+    if dialect_name == "postgresql":
+        # truncate the UTC wall-clock time, whatever the session time zone is
+        return func.date_trunc(bucket, func.timezone("UTC", column))
+    # SQLite stores UTC text; date() and its modifiers give the same bucket starts as date_trunc
+    if bucket == "week":
+        return func.date(column, "-6 days", "weekday 1")
+    if bucket == "month":
+        return func.date(column, "start of month")
+    return func.date(column)
+
+
+def bucket_totals_query(
+    dialect_name: str,
+    user_id: int,
+    model,
+    bucket: str,
+    start: datetime,
+    end: datetime,
+    category_id: int | None = None,
+):
+    column = _bucket_column(dialect_name, bucket, model.timestamp).label("bucket")
+    stmt = (
+        select(column, func.sum(model.amount), func.count())
+        .where(model.user_id == user_id, model.timestamp >= start, model.timestamp <= end)
+        .group_by(column)
+    )
+    if category_id is not None:
+        stmt = stmt.where(model.category_id == category_id)
+    return stmt
+
+
+async def bucket_totals(
+    db: AsyncSession,
+    user_id: int,
+    model,
+    bucket: str,
+    start: datetime,
+    end: datetime,
+    category_id: int | None = None,
+):
+    """
+    (bucket starts, totals, counts) for the non-empty buckets of `model` rows in [start, end].
+    """
+    stmt = bucket_totals_query(db.get_bind().dialect.name, user_id, model, bucket, start, end, category_id)
+    rows = (await db.execute(stmt)).all()
+    # date_trunc gives datetimes and SQLite gives 'YYYY-MM-DD'; keep the date part of either
+    return [str(row[0])[:10] for row in rows], [row[1] for row in rows], [row[2] for row in rows]
+
+
+def _periods(np, bucket: str, start: date, end: date):
+    """
+    Every bucket start from the bucket of `start` to the bucket of `end`, as datetime64[D].
+    """
+    first = np.datetime64(bucket_start(bucket, start), "D")
+    last = np.datetime64(bucket_start(bucket, end), "D")
+    if bucket == "month":
+        return np.arange(first.astype("datetime64[M]"), last.astype("datetime64[M]") + 1).astype("datetime64[D]")
+    step = 7 if bucket == "week" else 1
+    return np.arange(first, last + 1, step)
+
+
+def bucket_count(bucket: str, start: datetime, end: datetime) -> int:
+    first, last = bucket_start(bucket, start.date()), bucket_start(bucket, end.date())
+    if bucket == "month":
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    return (last - first).days // (7 if bucket == "week" else 1) + 1
+
+
+def build_series(bucket: str, start: datetime, end: datetime, buckets, totals, counts, window: int) -> dict:
+    """
+    Columns of the filled series: one entry per bucket, including the empty ones.
+    """
+    import numpy as np
+
+    periods = _periods(np, bucket, start.date(), end.date())
+    total = np.zeros(len(periods))
+    count = np.zeros(len(periods), dtype=np.int64)
+    if buckets:
+        index = np.searchsorted(periods, np.array(buckets, dtype="datetime64[D]"))
+        total[index] = np.asarray(totals, dtype=np.float64)
+        count[index] = np.asarray(counts, dtype=np.int64)
+
+    # rolling mean from prefix sums; the first window-1 buckets average over what is available
+    prefix = np.concatenate(([0.0], np.cumsum(total)))
+    position = np.arange(1, len(total) + 1)
+    window_start = np.maximum(position - window, 0)
+    rolling_mean = (prefix[position] - prefix[window_start]) / (position - window_start)
+
+    delta = np.full(len(total), np.nan)
+    delta[1:] = np.diff(total)
+    delta_pct = np.full(len(total), np.nan)
+    previous = total[:-1]
+    # no percentage change from an empty bucket
+    np.divide(delta[1:], previous, out=delta_pct[1:], where=previous != 0)
+
+    return {
+        "period": np.datetime_as_string(periods, unit="D").tolist(),
+        "total": np.round(total, 2),
+        "count": count,
+        "rolling_mean": np.round(rolling_mean, 2),
+        "cumulative": np.round(prefix[1:], 2),
+        "delta": np.round(delta, 2),
+        "delta_pct": np.round(delta_pct * 100, 2),
+    }
+
+
+def expense_columns_query(user_id: int, start: datetime, end: datetime):
+    return (
+        select(Expense.id, Expense.category_id, Expense.amount, Expense.timestamp)
+        .where(Expense.user_id == user_id, Expense.timestamp >= start, Expense.timestamp <= end)
+    )
+
+
+async def expense_columns(db: AsyncSession, user_id: int, start: datetime, end: datetime, batch_size: int = 5000):
+    """
+    (ids, category ids, amounts, timestamps) of the user's expenses in [start, end], streamed in
+    batches; ids and timestamps stay Python lists, the other two become NumPy arrays.
+    """
+    import numpy as np
+
+    result = await db.stream(expense_columns_query(user_id, start, end).execution_options(yield_per=batch_size))
+    ids, category_ids, amounts, timestamps = [], [], [], []
+    async for partition in result.partitions(batch_size):
+        batch_ids, batch_categories, batch_amounts, batch_timestamps = zip(*partition)
+        ids.extend(batch_ids)
+        category_ids.extend(batch_categories)
+        amounts.extend(batch_amounts)
+        timestamps.extend(batch_timestamps)
+    # expenses from before categories were required have no category; group them under 0
+    category_array = np.array([c if c is not None else 0 for c in category_ids], dtype=np.int64)
+    return ids, category_array, np.array(amounts, dtype=np.float64), timestamps
+
+
+def category_stats(category_ids, amounts, method: str = "zscore", threshold: float = 3.0) -> dict:
+    """
+    Per-category count, total, mean, median, p90 and (population) standard deviation, and the
+    expenses that are outliers within their own category, all from one sort of the input arrays.
+
+    method="zscore" flags |amount - mean| / std > threshold; method="iqr" flags amounts more than
+    threshold * IQR outside [Q1, Q3]. "outlier_rows" index into the input arrays, most extreme first.
+    """
+    import numpy as np
+
+    order = np.lexsort((amounts, category_ids))
+    values = amounts[order]
+    groups, starts, counts = np.unique(category_ids[order], return_index=True, return_counts=True)
+    group_of = np.repeat(np.arange(len(groups)), counts)
+
+    totals = np.add.reduceat(values, starts) if len(values) else np.zeros(0)
+    means = totals / counts
+    deviation = values - means[group_of]
+    std = np.sqrt(np.add.reduceat(deviation ** 2, starts) / counts) if len(values) else np.zeros(0)
+
+    def quantile(q):
+        # linear interpolation between the two closest ranks, like np.quantile's default
+        position = starts + q * (counts - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        return values[low] + (values[high] - values[low]) * (position - low)
+
+    median, p90 = quantile(0.5), quantile(0.9)
+
+    score = np.full(len(values), np.nan)
+    if method == "iqr":
+        q1, q3 = quantile(0.25)[group_of], quantile(0.75)[group_of]
+        spread = q3 - q1
+        distance = np.where(values > q3, values - q3, q1 - values)
+        flagged = distance > threshold * spread
+        # distance past the quartile in IQRs; undefined when the IQR is 0
+        np.divide(distance, spread, out=score, where=spread > 0)
+    else:
+        row_std = std[group_of]
+        np.divide(deviation, row_std, out=score, where=row_std > 0)
+        flagged = np.abs(np.nan_to_num(score)) > threshold
+
+    flagged_rows = np.flatnonzero(flagged)
+    # most extreme first; undefined scores last
+    extremeness = np.nan_to_num(np.abs(score[flagged_rows]), nan=-1.0)
+    flagged_rows = flagged_rows[np.argsort(-extremeness, kind="stable")]
+
+    return {
+        "category_ids": groups,
+        "count": counts,
+        "total": totals,
+        "mean": means,
+        "median": median,
+        "p90": p90,
+        "std": std,
+        "outliers": np.bincount(group_of[flagged], minlength=len(groups)),
+        "outlier_rows": order[flagged_rows],
+        "outlier_scores": score[flagged_rows],
+    }
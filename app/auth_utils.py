@@ -1,14 +1,22 @@
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer, HTTPBearer, HTTPAuthorizationCredentials
 from fastapi import Depends, Security
 
+import asyncio
+import logging
 import os
-from app.database import get_db
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from sqlalchemy import event
+from app import metrics
+from app.cache import LRUCache
+from app.database import get_db, session_scope
 from app.models import User
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 # Secret key to encode/decode JWT
@@ -16,32 +24,97 @@ SECRET_KEY = "mysecret"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 240 
 
+# Authenticated-principal cache (per process)
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 manual_bearer = HTTPBearer()                             # ✅ For Swagger (manual)
 
 
+logger = logging.getLogger(__name__)
+
+
 # Password hasher
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pinning min/max rounds to the configured cost makes passlib flag hashes made with any other
+# cost as needing an update, so they are transparently rehashed on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    # passlib and its bcrypt backend are imported on first use, not when the app is imported
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=BCRYPT_ROUNDS,
+        bcrypt__min_rounds=BCRYPT_ROUNDS,
+        bcrypt__max_rounds=BCRYPT_ROUNDS,
+    )
+
+# bcrypt runs on its own small pool so a login burst cannot starve the threadpool shared by the
+# sync routes. At most PASSWORD_WORKERS hashes run at once and PASSWORD_QUEUE_LIMIT more may wait;
+# anything beyond that is rejected immediately with 503.
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "32"))
+
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+_password_slots = threading.BoundedSemaphore(PASSWORD_WORKERS + PASSWORD_QUEUE_LIMIT)
+
+
+async def run_password_work(fn, *args):
+    if not _password_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent password operations, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        future = _password_executor.submit(fn, *args)
+    except Exception:
+        _password_slots.release()
+        raise
+    future.add_done_callback(lambda _: _password_slots.release())
+    return await asyncio.wrap_future(future)
+
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def hash_password(password: str):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+def _verify_and_update(plain_password: str, hashed_password: str):
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    return await run_password_work(hash_password, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str):
+    """
+    Returns (is_valid, new_hash). new_hash is set when the stored hash used a different bcrypt cost.
+    """
+    return await run_password_work(_verify_and_update, plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
+    from jose import jwt  # imported on first use, with its crypto backends
+
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_access_token(token: str):
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError as e:
-       print("JWT Error:", e)  # Add this line
+        logger.info(f"Rejected access token: {e}")
 
     raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -51,42 +124,107 @@ def decode_access_token(token: str):
 
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    print("RAW TOKEN:", token)  
+@dataclass(frozen=True)
+class Principal:
+    """
+    Lightweight stand-in for the User row; routes only need the identity, not a live ORM object.
+    """
+    id: int
+    username: str
+    email: str
 
-    try:
-        payload = decode_access_token(token)
-        print("Decoded payload:", payload)  
-        user_id: int = payload.get("user_id")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="User ID not found in token")
 
-        user = db.query(User).filter(User.id == user_id).first()
+token_cache = LRUCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)      # token -> decoded claims
+principal_cache = LRUCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)  # user id -> Principal
+
+
+def invalidate_user(user_id: int):
+    principal_cache.pop(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    invalidate_user(target.id)
+
+
+def cache_stats() -> dict:
+    return {"tokens": token_cache.stats(), "principals": principal_cache.stats()}
+
+
+@metrics.register_collector
+def _auth_cache_metrics():
+    caches = cache_stats()
+    for stat, type_name in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("size", "gauge")):
+        suffix = "_total" if type_name == "counter" else ""
+        yield from metrics.sample_lines(
+            f"auth_cache_{stat}{suffix}",
+            f"Authenticated-principal cache {stat}",
+            [({"cache": name}, values[stat]) for name, values in caches.items()],
+            type_name=type_name,
+        )
+
+
+def _decode_cached(token: str) -> dict:
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = decode_access_token(token)
+        # Never keep claims around longer than the token itself is valid
+        ttl = AUTH_CACHE_TTL_SECONDS
+        exp = payload.get("exp")
+        if exp is not None:
+            ttl = min(ttl, exp - time.time())
+        if ttl > 0:
+            token_cache.set(token, payload, ttl=ttl)
+    return payload
+
+
+async def _resolve_user(token: str, db: AsyncSession) -> Principal:
+    payload = _decode_cached(token)
+    user_id: int = payload.get("user_id")
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="User ID not found in token")
+
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = await db.get(User, user_id)
         if not user:
             raise HTTPException(status_code=401, detail="User not found in DB")
+        principal = Principal(id=user.id, username=user.username, email=user.email)
+        principal_cache.set(user_id, principal)
+
+    return principal
 
-        return user
 
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
+    try:
+        return await _resolve_user(token, db)
     except Exception as e:
-        print("Error in get_current_user:", e)
+        logger.info(f"Authentication failed: {e}")
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     
 
-def get_current_user_from_bearer(
+async def authenticate_token(token: str | None) -> Principal:
+    """
+    For connections without a request-scoped session (WebSockets): resolve `token` with a
+    short-lived session of its own.
+    """
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    async with session_scope() as db:
+        try:
+            return await _resolve_user(token, db)
+        except Exception as e:
+            logger.info(f"Authentication failed: {e}")
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+
+async def get_current_user_from_bearer(
     credentials: HTTPAuthorizationCredentials = Security(manual_bearer),
-    db: Session = Depends(get_db),
-) -> User:
+    db: AsyncSession = Depends(get_db),
+) -> Principal:
     token = credentials.credentials
     try:
-        payload = decode_access_token(token)
-        user_id: int = payload.get("user_id")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="User ID not found in token")
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found in DB")
-        return user
+        return await _resolve_user(token, db)
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
-
-
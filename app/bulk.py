@@ -0,0 +1,51 @@
+# bulk.py
+# Loads many ledger rows in as few round trips as the driver allows:
+#   asyncpg  -> COPY via copy_records_to_table
+#   psycopg2 -> COPY ... FROM STDIN via copy_expert (DB_MODE=sync)
+#   anything else -> one executemany INSERT
+# Rows go into the caller's transaction; committing (or rolling back) is up to the caller.
+import csv
+import io
+
+from sqlalchemy import insert
+
+
+async def _copy_asyncpg(db, table, columns, rows):
+    connection = await db.connection()
+    # Run a statement through SQLAlchemy first so the DBAPI transaction is open and COPY joins it
+    await connection.exec_driver_sql("SELECT 1")
+    raw = await connection.get_raw_connection()
+    records = [tuple(row[column] for column in columns) for row in rows]
+    await raw.driver_connection.copy_records_to_table(table.name, records=records, columns=columns)
+
+
+def _copy_psycopg2(session, table, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if row[column] is None else row[column] for column in columns])
+    buffer.seek(0)
+
+    quoted = ", ".join(f'"{column}"' for column in columns)
+    dbapi_connection = session.connection().connection.dbapi_connection
+    with dbapi_connection.cursor() as cursor:
+        # Unquoted empty fields are NULL in CSV mode
+        cursor.copy_expert(f'COPY "{table.name}" ({quoted}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+async def bulk_load(db, model, rows: list[dict]):
+    """
+    Insert `rows` (dicts keyed by column name, all with the same keys) into `model`'s table.
+    """
+    if not rows:
+        return
+    table = model.__table__
+    columns = list(rows[0].keys())
+    dialect = db.get_bind().dialect
+
+    if dialect.name == "postgresql" and dialect.driver == "asyncpg":
+        await _copy_asyncpg(db, table, columns, rows)
+    elif dialect.name == "postgresql" and dialect.driver == "psycopg2":
+        await db.run_sync(_copy_psycopg2, table, columns, rows)
+    else:
+        await db.execute(insert(table), rows)
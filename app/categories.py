@@ -0,0 +1,205 @@
+# categories.py
+# Expense category names <-> per-user smallint ids (the categories table).
+#
+# Expenses store categories.id; grouping and filtering run on that compact key and names are
+# only looked up for what is returned. Both directions are cached in-process: a category is
+# never renamed or removed (short of deleting the user), so an entry never goes stale.
+# Queries that return expense rows with their names outer-join categories on its primary key
+# (join_names); per-row subqueries would run once for every row of a page or an export.
+# New categories are inserted on the caller's session, in a SAVEPOINT, so they commit or roll
+# back with the request and never need a second pooled connection (which SQLite would also find
+# locked by the request's own writes). Their ids are cached only once the request's transaction
+# commits, so a request that rolls back can't leave a cached id with no row.
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import and_, event, func, insert, literal, select, true, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import metrics
+from app.cache import LRUCache
+from app.models import Category, Expense
+
+CATEGORY_CACHE_SIZE = int(os.getenv("CATEGORY_CACHE_SIZE", "20000"))
+
+MAX_CATEGORIES_PER_USER = 32767  # smallint
+
+# the category name of an expense row, for statements passed through join_names()
+CATEGORY_NAME = Category.name.label("category")
+
+_ids = LRUCache(maxsize=CATEGORY_CACHE_SIZE, ttl=None)    # (user_id, name) -> id
+_names = LRUCache(maxsize=CATEGORY_CACHE_SIZE, ttl=None)  # (user_id, id) -> name
+
+_CREATED = "categories_created"  # Session.info key: {(user_id, name): id} inserted by the open transaction
+
+
+def _remember(user_id: int, category_id: int, name: str):
+    _ids.set((user_id, name), category_id)
+    _names.set((user_id, category_id), name)
+
+
+def _found(db: AsyncSession, user_id: int, category_id: int, name: str):
+    # A row read through `db`: cached now, unless `db`'s own transaction created it and hasn't committed
+    created = db.sync_session.info.get(_CREATED)
+    if created is not None and (user_id, name) in created:
+        created[(user_id, name)] = category_id
+    else:
+        _remember(user_id, category_id, name)
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_committed(session):
+    if session.in_nested_transaction():
+        return  # a SAVEPOINT released; the rows are still uncommitted
+    for (user_id, name), category_id in session.info.pop(_CREATED, {}).items():
+        if category_id is not None:
+            _remember(user_id, category_id, name)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back(session):
+    if not session.in_nested_transaction():
+        session.info.pop(_CREATED, None)
+
+
+def cache_stats() -> dict:
+    return {"ids": _ids.stats(), "names": _names.stats()}
+
+
+@metrics.register_collector
+def _category_cache_metrics():
+    caches = cache_stats()
+    for stat, type_name in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("size", "gauge")):
+        suffix = "_total" if type_name == "counter" else ""
+        yield from metrics.sample_lines(
+            f"category_cache_{stat}{suffix}",
+            f"Category name/id cache {stat}",
+            [({"cache": name}, values[stat]) for name, values in caches.items()],
+            type_name=type_name,
+        )
+
+
+def join_names(stmt):
+    """
+    `stmt`, a select from expenses, with each row's category outer-joined so it can select CATEGORY_NAME.
+    """
+    return stmt.join_from(
+        Expense, Category, and_(Category.user_id == Expense.user_id, Category.id == Expense.category_id), isouter=True
+    )
+
+
+async def lookup_id(db: AsyncSession, user_id: int, name: str) -> int | None:
+    """
+    The id of `user_id`'s category `name`, or None if the user never used it.
+    """
+    category_id = _ids.get((user_id, name))
+    if category_id is None:
+        category_id = await db.scalar(select(Category.id).where(Category.user_id == user_id, Category.name == name))
+        if category_id is not None:
+            _found(db, user_id, category_id, name)
+    return category_id
+
+
+def _insert_ignoring_conflicts(dialect_name: str):
+    if dialect_name == "postgresql":
+        return postgresql.insert(Category).on_conflict_do_nothing()
+    if dialect_name == "sqlite":
+        return sqlite.insert(Category).on_conflict_do_nothing()
+    return insert(Category)
+
+
+async def _create(db: AsyncSession, user_id: int, names: list[str]):
+    # One INSERT for all of `names`, numbered MAX(id) + 1, + 2, ...; a concurrent writer taking
+    # one of those ids or names just skips that row, and the caller re-reads what was committed.
+    stmt = _insert_ignoring_conflicts(db.get_bind().dialect.name)
+    new = union_all(*(
+        select(literal(position).label("position"), literal(name).label("name"))
+        for position, name in enumerate(names, start=1)
+    )).subquery("new")
+    top = select(func.coalesce(func.max(Category.id), 0)).where(Category.user_id == user_id).scalar_subquery()
+    # WHERE true: SQLite would otherwise read ON CONFLICT as a join constraint of the SELECT
+    next_ids = select(literal(user_id), top + new.c.position, new.c.name).where(true())
+    try:
+        async with db.begin_nested():
+            result = await db.execute(stmt.from_select(["user_id", "id", "name"], next_ids))
+    except (IntegrityError, DataError):  # DataError: past the smallint range
+        return
+    if result.rowcount:
+        created = db.sync_session.info.setdefault(_CREATED, {})
+        for name in names:
+            created.setdefault((user_id, name), None)
+
+
+async def resolve_ids(db: AsyncSession, user_id: int, names) -> dict[str, int]:
+    """
+    {name: id} for `names`, creating the categories the user doesn't have yet.
+    """
+    resolved = {}
+    missing = []
+    for name in dict.fromkeys(names):
+        category_id = _ids.get((user_id, name))
+        if category_id is None:
+            missing.append(name)
+        else:
+            resolved[name] = category_id
+
+    for _ in range(5):
+        if not missing:
+            return resolved
+        result = await db.execute(
+            select(Category.name, Category.id).where(Category.user_id == user_id, Category.name.in_(missing))
+        )
+        for name, category_id in result.all():
+            _found(db, user_id, category_id, name)
+            resolved[name] = category_id
+        missing = [name for name in missing if name not in resolved]
+        if missing:
+            await _create(db, user_id, missing)
+
+    count = await db.scalar(select(func.count()).select_from(Category).where(Category.user_id == user_id))
+    if count + len(missing) > MAX_CATEGORIES_PER_USER:
+        raise HTTPException(status_code=400, detail=f"A user can have at most {MAX_CATEGORIES_PER_USER} categories")
+    raise HTTPException(status_code=503, detail="Could not create category, please retry")
+
+
+async def resolve_id(db: AsyncSession, user_id: int, name: str) -> int:
+    return (await resolve_ids(db, user_id, [name]))[name]
+
+
+async def names_for(db: AsyncSession, user_id: int, category_ids) -> dict[int, str]:
+    """
+    {id: name} for `category_ids` of `user_id`.
+    """
+    names = {}
+    missing = []
+    for category_id in set(category_ids):
+        name = _names.get((user_id, category_id))
+        if name is None:
+            missing.append(category_id)
+        else:
+            names[category_id] = name
+
+    if missing:
+        result = await db.execute(
+            select(Category.id, Category.name).where(Category.user_id == user_id, Category.id.in_(missing))
+        )
+        for category_id, name in result.all():
+            _found(db, user_id, category_id, name)
+            names[category_id] = name
+    return names
+
+
+async def encode_rows(db: AsyncSession, user_id: int, rows: list[dict]) -> list[dict]:
+    """
+    Copies of expense `rows` with "category" (a name) replaced by "category_id", ready to insert.
+    """
+    ids = await resolve_ids(db, user_id, (row["category"] for row in rows))
+    encoded = []
+    for row in rows:
+        row = dict(row)
+        row["category_id"] = ids[row.pop("category")]
+        encoded.append(row)
+    return encoded
@@ -1,51 +1,174 @@
 # crud.py
 from fastapi import APIRouter, Depends, HTTPException, status,Query
 from app.database import get_db
-from sqlalchemy.orm import Session
-from sqlalchemy import extract
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert, select
 from sqlalchemy import func
 from . import models
-from datetime import datetime,date,timedelta
+from datetime import datetime,date,timedelta,timezone
 from .models import Expense
 from .models import User
-from app import models, schemas
+from app import models, schemas, ledger, categories, fastjson
+from app.pagination import DEFAULT_PAGE_SIZE, keyset_page, split_page
+import os
 
-def get_monthly_expenses(db: Session):
-    now = datetime.now()
-    return db.query(Expense).filter(
-        extract('month', Expense.timestamp) == now.month,
-        extract('year', Expense.timestamp) == now.year
-    ).all()
+# Upper bound on records accepted by the POST /<ledger>/batch endpoints
+BATCH_MAX_RECORDS = int(os.getenv("BATCH_MAX_RECORDS", "500"))
 
+# columns selected for expense listings, in schemas.Expenseout field order
+_, EXPENSE_COLUMNS = fastjson.schema_columns(models.Expense, schemas.Expenseout, category=categories.CATEGORY_NAME)
 
-def get_expenses_by_date_range(db: Session, start_date: datetime, end_date: datetime,user_id: int):
+def monthly_expenses_query(user_id: int | None, now: datetime):
+    # A half-open range on the raw column (not extract()) so Postgres prunes to this month's partition
+    month_start = datetime(now.year, now.month, 1, tzinfo=timezone.utc)
+    next_month = datetime(now.year + now.month // 12, now.month % 12 + 1, 1, tzinfo=timezone.utc)
+    stmt = select(Expense).where(Expense.timestamp >= month_start, Expense.timestamp < next_month)
+    if user_id is not None:
+        stmt = stmt.where(Expense.user_id == user_id)
+    return stmt
+
+
+async def get_monthly_expenses(db: AsyncSession, user_id: int | None = None):
+    result = await db.execute(monthly_expenses_query(user_id, datetime.now(timezone.utc)))
+    return result.scalars().all()
+
+
+def ledger_page_query(model, columns, user_id: int, limit: int, cursor: str | None = None):
+    """
+    One keyset page of `user_id`'s `model` rows, newest first, selecting `columns` (GET /<ledger>/).
+    """
+    stmt = select(*columns).where(model.user_id == user_id)
+    if model is Expense:
+        stmt = categories.join_names(stmt)
+    return keyset_page(stmt, model, limit, cursor)
+
+
+def expense_range_queries(
+    user_id: int,
+    start_date: datetime,
+    end_date: datetime,
+    category_id: int | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+):
+    """
+    (totals, page) statements for get_expense_range().
+    """
+    conditions = [
+        models.Expense.user_id == user_id,
+        models.Expense.timestamp >= start_date,
+        models.Expense.timestamp <= end_date,
+    ]
+    if category_id is not None:
+        conditions.append(models.Expense.category_id == category_id)
+
+    totals = select(func.coalesce(func.sum(models.Expense.amount), 0.0), func.count()).where(*conditions)
+    rows = categories.join_names(select(*EXPENSE_COLUMNS).where(*conditions))
+    page = keyset_page(rows, models.Expense, limit, cursor)
+    return totals, page
+
+
+def category_totals_query(user_id: int, start_date: datetime | None = None, end_date: datetime | None = None):
+    # Grouped on the smallint category_id; names are looked up for the groups only
+    stmt = select(models.Expense.category_id, func.sum(models.Expense.amount).label("total_amount")).where(
+        models.Expense.user_id == user_id
+    )
+    if start_date is not None:
+        stmt = stmt.where(models.Expense.timestamp >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(models.Expense.timestamp <= end_date)
+    return stmt.group_by(models.Expense.category_id)
+
+
+def monthly_rollups_query(user_id: int):
+    return (
+        select(models.MonthlyRollup)
+        .where(models.MonthlyRollup.user_id == user_id)
+        .order_by(models.MonthlyRollup.month.desc())
+    )
+
+
+async def get_expense_range(
+    db: AsyncSession,
+    user_id: int,
+    start_date: datetime,
+    end_date: datetime,
+    category_id: int | None = None,
+    totals_only: bool = False,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+):
+    """
+    (total amount, count, page of rows, next cursor) for one user's expenses in [start_date, end_date].
+    The total and count are computed in SQL over the whole range; rows are one keyset page,
+    newest first, and are not fetched at all when totals_only is set.
+    """
+    totals_query, page_query = expense_range_queries(user_id, start_date, end_date, category_id, limit, cursor)
+    totals = (await db.execute(totals_query)).one()
+    total_amount, count = float(totals[0]), totals[1]
+    if totals_only or not count:
+        return total_amount, count, [], None
+
+    result = await db.execute(page_query)
+    rows, next_cursor = split_page(result.all(), limit)
+    return total_amount, count, rows, next_cursor
+
+
+async def get_expenses_by_date_range(
+    db: AsyncSession,
+    start_date: datetime,
+    end_date: datetime,
+    user_id: int,
+    totals_only: bool = False,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str | None = None,
+):
     # Add 1 day and subtract a microsecond to include the full end_date
     end_date = end_date + timedelta(days=1) - timedelta(microseconds=1)
 
-    expenses = (
-        db.query(models.Expense)
-        .filter(models.Expense.timestamp >= start_date, models.Expense.timestamp <= end_date)
-        .order_by(models.Expense.timestamp)
-        .all()
+    total_amount, count, expenses, next_cursor = await get_expense_range(
+        db, user_id, start_date, end_date, totals_only=totals_only, limit=limit, cursor=cursor
     )
 
-    total_amount = sum([e.amount for e in expenses])
-
-    if not expenses:
+    if not count:
         return schemas.ExpenseSummary(
             total_amount=0.0,
+            count=0,
             expenses=[],
             message="No expenses found for the given date range."
         )
 
     return schemas.ExpenseSummary(
         total_amount=total_amount,
-        expenses=expenses
+        count=count,
+        expenses=expenses,
+        next_cursor=next_cursor
     )
 
-def get_expenses_grouped_by_category(db: Session):
-    return (
-        db.query(models.Expense.category, func.sum(models.Expense.amount).label("total_amount"))
-        .group_by(models.Expense.category)
-        .all()
+async def get_expenses_grouped_by_category(db: AsyncSession, user_id: int):
+    rows = (await db.execute(category_totals_query(user_id))).all()
+    names = await categories.names_for(db, user_id, [row.category_id for row in rows])
+    return [(names.get(row.category_id, ""), row.total_amount) for row in rows]
+
+
+async def create_ledger_rows(db: AsyncSession, model, user_id: int, rows: list[dict]) -> list[dict]:
+    """
+    Insert many rows of one ledger in a single INSERT ... RETURNING id, timestamp and commit once.
+    Returns the rows with their new id and server-side timestamp filled in.
+    (On SQLite, which has no insertmanyvalues sentinel to match RETURNING rows to parameters,
+    SQLAlchemy runs one INSERT per row instead.)
+    """
+    rows = [dict(row, user_id=user_id) for row in rows]
+    # expenses store a category id; the returned rows keep the names
+    insert_rows = await categories.encode_rows(db, user_id, rows) if model is Expense else rows
+    result = await db.execute(
+        insert(model).returning(model.id, model.timestamp, sort_by_parameter_order=True),
+        insert_rows,
     )
+    for row, (new_id, timestamp) in zip(rows, result.all()):
+        row["id"] = new_id
+        row["timestamp"] = timestamp
+
+    await ledger.record_rows(db, user_id, model.__tablename__, rows)
+    await db.commit()
+    return rows
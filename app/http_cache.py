@@ -0,0 +1,81 @@
+# http_cache.py
+# Conditional GET for the read endpoints that aggregate a user's ledger.
+#
+# Every ledger write bumps BalanceSnapshot.version (see app/ledger.py), so (user, version) identifies
+# the state of everything a user can read. The ETag is derived from it: a client that already has the
+# current version gets a 304 after a single primary-key lookup, with no aggregation SQL at all.
+# Fresh bodies are also kept in a bounded in-process cache keyed by (user, route, params, version);
+# a write changes the version, so stale entries are simply never hit again and age out of the LRU.
+import os
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import LRUCache
+from app.models import BalanceSnapshot
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+
+response_cache = LRUCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS)
+
+
+async def data_version(db: AsyncSession, user_id: int) -> int:
+    version = await db.scalar(select(BalanceSnapshot.version).where(BalanceSnapshot.user_id == user_id))
+    return version or 0
+
+
+def make_etag(user_id: int, version: int) -> str:
+    return f'"u{user_id}-v{version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
+
+def check_not_modified(request: Request, response: Response, user_id: int, version: int):
+    """
+    Sets the ETag on `response` and returns a 304 Response if the client already has this version,
+    otherwise None.
+    """
+    etag = make_etag(user_id, version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    db: AsyncSession,
+    user_id: int,
+    route: str,
+    params: tuple,
+    compute,
+):
+    """
+    304 if the client's ETag is current; otherwise the cached body for this version, or
+    `await compute()` (which is then cached).
+    """
+    version = await data_version(db, user_id)
+    not_modified = check_not_modified(request, response, user_id, version)
+    if not_modified is not None:
+        return not_modified
+
+    key = (user_id, route, params, version)
+    body = response_cache.get(key)
+    if body is None:
+        body = await compute()
+        response_cache.set(key, body)
+    return body
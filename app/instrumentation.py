@@ -0,0 +1,269 @@
+# instrumentation.py
+# Request and query metrics for GET /metrics.
+#
+# RequestMetricsMiddleware times every HTTP request and labels it with the matched route template
+# (e.g. /expenses/{id}), so per-route series stay bounded no matter how many ids are requested.
+# instrument_engine() hooks SQLAlchemy's cursor events: each statement is timed, added to the
+# current request's RequestStats (a contextvar, so it follows the request through the threadpool and
+# the async driver's greenlet), and logged to the "app.slow_query" logger above SLOW_QUERY_THRESHOLD_MS.
+#
+# Query budgets: a route declares the most statements it may run with
+#     @router.get(..., dependencies=[Depends(query_budget(2))])
+# and with QUERY_BUDGET_MODE=log|raise (development and tests) going over it is logged with the
+# offending statements, or fails the request. A route that works in steps adds each step's share
+# with extend_query_budget(). count_queries() / assert_max_queries() do the same
+# for a block of test code, e.g. around an in-process httpx.ASGITransport call.
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+
+from app import metrics
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))  # <= 0 disables the log
+SLOW_QUERY_MAX_PARAMS_CHARS = int(os.getenv("SLOW_QUERY_MAX_PARAMS_CHARS", "1000"))
+
+# "off" (default): budgets are ignored and statements are not kept
+# "log":           requests over budget are logged with their statements once they finish
+# "raise":         the first statement over budget raises QueryBudgetExceeded (a 500)
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off").lower()
+if QUERY_BUDGET_MODE not in ("off", "log", "raise"):
+    raise ValueError("QUERY_BUDGET_MODE must be 'off', 'log' or 'raise'.")
+
+slow_query_logger = logging.getLogger("app.slow_query")
+query_budget_logger = logging.getLogger("app.query_budget")
+
+# unmatched paths (404s, probes) share one label instead of one series per path
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+    budget: int | None = None
+    statements: list = field(default_factory=list)  # only kept when budgets or a recorder are active
+
+
+class QueryBudgetExceeded(RuntimeError):
+    def __init__(self, budget: int, statements: list):
+        self.budget = budget
+        self.statements = list(statements)
+        super().__init__(
+            f"{len(self.statements)} SQL statements exceed the budget of {budget}:\n" + "\n".join(self.statements)
+        )
+
+
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+# RequestStats opened by count_queries(), innermost last
+_query_recorders: ContextVar[tuple] = ContextVar("query_recorders", default=())
+
+
+def current_request_stats() -> RequestStats | None:
+    return _request_stats.get()
+
+
+# ---------------- metrics ----------------
+
+http_requests = metrics.Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status code",
+    labelnames=("method", "route", "status"),
+)
+http_request_duration = metrics.Histogram(
+    "http_request_duration_seconds",
+    "Time from receiving the request to sending the last body chunk",
+    labelnames=("method", "route"),
+)
+http_requests_in_flight = metrics.Gauge(
+    "http_requests_in_flight",
+    "Requests currently being handled",
+)
+http_request_db_queries = metrics.Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per request",
+    labelnames=("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+http_request_db_seconds = metrics.Histogram(
+    "http_request_db_seconds",
+    "Time spent executing SQL per request",
+    labelnames=("method", "route"),
+)
+db_query_duration = metrics.Histogram(
+    "db_query_duration_seconds",
+    "Execution time of individual SQL statements",
+    labelnames=("engine",),
+)
+db_slow_queries = metrics.Counter(
+    "db_slow_queries_total",
+    "Statements slower than SLOW_QUERY_THRESHOLD_MS",
+    labelnames=("engine",),
+)
+query_budget_exceeded = metrics.Counter(
+    "http_query_budget_exceeded_total",
+    "Requests that ran more SQL statements than their route's query_budget (QUERY_BUDGET_MODE != off)",
+    labelnames=("method", "route"),
+)
+
+
+# ---------------- HTTP ----------------
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware), so streaming responses are timed to their last
+    chunk and nothing is buffered.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            _request_stats.reset(token)
+
+            # the router stores the matched APIRoute in the scope it was handed
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or UNMATCHED_ROUTE
+            method = scope["method"]
+            http_requests.inc(method=method, route=route_path, status=str(status_code))
+            http_request_duration.observe(elapsed, method=method, route=route_path)
+            http_request_db_queries.observe(stats.queries, method=method, route=route_path)
+            http_request_db_seconds.observe(stats.db_seconds, method=method, route=route_path)
+            if stats.budget is not None and stats.queries > stats.budget:
+                query_budget_exceeded.inc(method=method, route=route_path)
+                query_budget_logger.warning(
+                    f"{method} {route_path} ran {stats.queries} SQL statements, budget is {stats.budget}:\n"
+                    + "\n".join(stats.statements)
+                )
+
+
+# ---------------- query budgets ----------------
+
+def query_budget(max_queries: int):
+    """
+    Route dependency declaring the most SQL statements a request may run, authentication included.
+    Only enforced when QUERY_BUDGET_MODE is "log" or "raise".
+    """
+
+    async def _declare_budget():
+        stats = _request_stats.get()
+        if stats is not None and QUERY_BUDGET_MODE != "off":
+            stats.budget = max_queries
+
+    return _declare_budget
+
+
+def extend_query_budget(extra_queries: int):
+    """
+    Allow the current request `extra_queries` more statements than its query_budget(), for routes
+    whose work comes in fixed-size steps (e.g. one chunk of an import); call it once per step.
+    """
+    stats = _request_stats.get()
+    if stats is not None and stats.budget is not None:
+        stats.budget += extra_queries
+
+
+@contextmanager
+def count_queries():
+    """
+    Counts (and keeps the text of) every statement run inside the block, in this context.
+    """
+    recorder = RequestStats()
+    token = _query_recorders.set(_query_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _query_recorders.reset(token)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int):
+    """
+    Test helper: fails if the block runs more than `max_queries` statements.
+    """
+    with count_queries() as recorder:
+        yield recorder
+    if recorder.queries > max_queries:
+        raise AssertionError(str(QueryBudgetExceeded(max_queries, recorder.statements)))
+
+
+# ---------------- SQL ----------------
+
+def _format_params(parameters) -> str:
+    text = repr(parameters)
+    if len(text) > SLOW_QUERY_MAX_PARAMS_CHARS:
+        text = text[:SLOW_QUERY_MAX_PARAMS_CHARS] + "...(truncated)"
+    return text
+
+
+def instrument_engine(sync_engine, label: str):
+    """
+    Time every statement run on `sync_engine` (for an AsyncEngine pass async_engine.sync_engine).
+    """
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        db_query_duration.observe(elapsed, engine=label)
+
+        for recorder in _query_recorders.get():
+            recorder.queries += 1
+            recorder.db_seconds += elapsed
+            recorder.statements.append(statement)
+
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+            if QUERY_BUDGET_MODE != "off":
+                stats.statements.append(statement)
+
+        if SLOW_QUERY_THRESHOLD_MS > 0 and elapsed * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+            db_slow_queries.inc(engine=label)
+            slow_query_logger.warning(
+                f"Slow query ({elapsed * 1000:.1f} ms, engine={label}, executemany={executemany}): "
+                f"{statement} | params={_format_params(parameters)}"
+            )
+
+        if QUERY_BUDGET_MODE == "raise" and stats is not None and stats.budget is not None and stats.queries > stats.budget:
+            # The statement already ran: close its cursor, or on SQLite an unread INSERT ... RETURNING
+            # keeps the write lock after the rollback and every later writer gets "database is locked"
+            cursor.close()
+            raise QueryBudgetExceeded(stats.budget, stats.statements)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        # a failed statement never reaches after_cursor_execute; drop its start time. (Don't look at
+        # exception_context.cursor: SQLAlchemy declares it but never sets it.)
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
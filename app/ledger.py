@@ -0,0 +1,166 @@
+# ledger.py
+# Keeps the per-user aggregate tables in step with writes to expenses, incomes and savings.
+# Every create/update/delete path calls record() inside the same transaction as the row change,
+# so the aggregates are committed (or rolled back) together with the ledger row itself.
+# It also marks the user as a recent writer, which keeps their reads on the primary for a while
+# (see app/replica.py), and as changed, which pushes their new state to live connections once
+# the transaction commits (see app/live.py).
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from sqlalchemy import delete, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import live, replica
+from app.models import BalanceSnapshot, MonthlyRollup
+
+# ledger table -> column in the aggregate tables
+LEDGER_FIELDS = {
+    "incomes": "income",
+    "expenses": "expense",
+    "savings": "saving",
+}
+
+
+def month_start(ts: date) -> date:
+    # Months are UTC months, as in the backfill and the ledger partitions; naive values are UTC already
+    if isinstance(ts, datetime) and ts.tzinfo:
+        ts = ts.astimezone(timezone.utc)
+    return date(ts.year, ts.month, 1)
+
+
+def _upsert_insert(db: AsyncSession):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    return None
+
+
+async def _increment(db: AsyncSession, model, keys: dict, deltas: dict):
+    """
+    Add `deltas` to the row of `model` identified by `keys`, creating it if it does not exist yet.
+    """
+    dialect_insert = _upsert_insert(db)
+    if dialect_insert is not None:
+        # Single atomic statement: concurrent writers for the same row just add up
+        stmt = dialect_insert(model).values(**keys, **deltas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[getattr(model, key) for key in keys],
+            set_={
+                column: getattr(model, column) + getattr(stmt.excluded, column)
+                for column in deltas
+            },
+        )
+        await db.execute(stmt)
+        return
+
+    result = await db.execute(
+        update(model)
+        .where(*(getattr(model, key) == value for key, value in keys.items()))
+        .values({column: getattr(model, column) + value for column, value in deltas.items()})
+    )
+    if result.rowcount == 0:
+        await db.execute(insert(model).values(**keys, **deltas))
+
+
+async def _increment_many(db: AsyncSession, model, keys: list[str], rows: list[dict]):
+    """
+    _increment() for several rows of `model` (mappings with the same columns: `keys` plus the
+    deltas), in a single statement where the dialect has an upsert.
+    """
+    dialect_insert = _upsert_insert(db)
+    if dialect_insert is None:
+        for row in rows:
+            deltas = {column: value for column, value in row.items() if column not in keys}
+            await _increment(db, model, {key: row[key] for key in keys}, deltas)
+        return
+
+    stmt = dialect_insert(model).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[getattr(model, key) for key in keys],
+        set_={
+            column: getattr(model, column) + getattr(stmt.excluded, column)
+            for column in rows[0] if column not in keys
+        },
+    )
+    await db.execute(stmt)
+
+
+async def apply_monthly_delta(
+    db: AsyncSession,
+    user_id: int,
+    ts: datetime,
+    income: float = 0.0,
+    expense: float = 0.0,
+    saving: float = 0.0,
+    entries: int = 0,
+):
+    month = month_start(ts)
+    await _increment(
+        db,
+        MonthlyRollup,
+        {"user_id": user_id, "month": month},
+        {"income": income, "expense": expense, "saving": saving, "entries": entries},
+    )
+
+    if entries < 0:
+        # A month with no ledger rows left disappears from the summary, like it did before the rollups
+        await db.execute(
+            delete(MonthlyRollup).where(
+                MonthlyRollup.user_id == user_id,
+                MonthlyRollup.month == month,
+                MonthlyRollup.entries <= 0,
+            )
+        )
+
+
+async def apply_balance_delta(
+    db: AsyncSession,
+    user_id: int,
+    income: float = 0.0,
+    expense: float = 0.0,
+    saving: float = 0.0,
+):
+    replica.mark_user_write(user_id)
+    live.mark_changed(db, user_id)
+    await _increment(
+        db,
+        BalanceSnapshot,
+        {"user_id": user_id},
+        {"total_income": income, "total_expense": expense, "total_saving": saving, "version": 1},
+    )
+
+
+async def record(db: AsyncSession, entry, sign: int = 1):
+    """
+    Add (sign=1) or remove (sign=-1) a flushed Expense/Income/Saving row from the aggregates.
+    """
+    field = LEDGER_FIELDS[entry.__tablename__]
+    amount = {field: sign * entry.amount}
+    await apply_monthly_delta(db, entry.user_id, entry.timestamp, entries=sign, **amount)
+    await apply_balance_delta(db, entry.user_id, **amount)
+
+
+async def record_rows(db: AsyncSession, user_id: int, ledger_table: str, rows):
+    """
+    Add many new rows (mappings with "amount" and "timestamp") of one ledger to the aggregates
+    with one statement for all the touched months plus one for the balance, instead of one set per row.
+    """
+    field = LEDGER_FIELDS[ledger_table]
+    months = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        bucket = months[month_start(row["timestamp"])]
+        bucket[0] += row["amount"]
+        bucket[1] += 1
+
+    if months:
+        await _increment_many(db, MonthlyRollup, ["user_id", "month"], [
+            {
+                "user_id": user_id, "month": month,
+                **dict.fromkeys(LEDGER_FIELDS.values(), 0.0), field: amount, "entries": count,
+            }
+            for month, (amount, count) in months.items()
+        ])
+        await apply_balance_delta(db, user_id, **{field: sum(amount for amount, _ in months.values())})
@@ -0,0 +1,308 @@
+# live.py
+# Pushes a user's balance and current-month totals to their open live connections (/ws/ledger,
+# /ledger/stream) whenever their expenses, income or savings change, so dashboards stop polling.
+#
+# Ledger writes mark their session (app/ledger.py). When that transaction commits, the user ids
+# are published on a backend:
+#   * "memory" delivers to this process's connections only (a single worker)
+#   * "postgres" sends them with NOTIFY and every worker LISTENs, so a write handled by one
+#     worker reaches clients connected to any other
+# A worker that receives a change and has connections for that user reads the new state once
+# (two primary-key lookups on the primary, which a replica might lag) and fans it out. Changes
+# arriving while that read runs are coalesced into one more read. Nothing is read for users
+# nobody is watching.
+#
+# Every connection has a bounded queue (LIVE_QUEUE_SIZE). Each event carries the full current
+# state, so when a slow client's queue is full the oldest event is dropped. A slow client never
+# blocks the publisher or grows memory without bound.
+import asyncio
+import contextvars
+import logging
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app import database, metrics
+from app.models import BalanceSnapshot, MonthlyRollup
+
+LIVE_BACKEND = os.getenv("LIVE_BACKEND", "memory")  # memory | postgres
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "16"))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+LIVE_CHANNEL = "ledger_changes"
+
+logger = logging.getLogger(__name__)
+
+live_connections = metrics.Gauge(
+    "live_connections",
+    "Open live ledger connections",
+    labelnames=("transport",),
+)
+live_events = metrics.Counter(
+    "live_events_total",
+    "Ledger events queued for live connections",
+)
+live_events_dropped = metrics.Counter(
+    "live_events_dropped_total",
+    "Ledger events dropped because a live connection's queue was full",
+)
+
+_CHANGED_USERS = "live_changed_users"  # Session.info key
+
+_subscribers = defaultdict(set)  # user id -> {Subscription}
+_last_month = {}                 # user id -> month totals of the last event, for deltas
+_refreshing = {}                 # user id -> True if it changed again during the current read
+_tasks = set()
+_loop = None
+_backend = None
+
+
+class Subscription:
+    """
+    One live connection's bounded queue of events.
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+
+    def put(self, payload: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+            live_events_dropped.inc()
+        self.queue.put_nowait(payload)
+        live_events.inc()
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+# ---------------- state ----------------
+
+def _month_totals(month: str, rollup) -> dict:
+    income = rollup.income if rollup else 0.0
+    expense = rollup.expense if rollup else 0.0
+    saving = rollup.saving if rollup else 0.0
+    return {
+        "month": month,
+        "total_income": round(income, 2),
+        "total_expense": round(expense, 2),
+        "total_saving": round(saving, 2),
+        "balance": round(income - expense - saving, 2),
+    }
+
+
+async def load_event(user_id: int) -> dict:
+    """
+    The user's current balance and current-month totals, plus the change in the month's totals
+    since the previous event this process sent for them.
+    """
+    now = datetime.now(timezone.utc)
+    month_start = now.date().replace(day=1)
+    async with database.session_scope() as db:
+        snapshot = await db.get(BalanceSnapshot, user_id)
+        rollup = await db.get(MonthlyRollup, (user_id, month_start))
+
+    income = snapshot.total_income if snapshot else 0.0
+    expense = snapshot.total_expense if snapshot else 0.0
+    saving = snapshot.total_saving if snapshot else 0.0
+    month = _month_totals(month_start.strftime("%Y-%m"), rollup)
+
+    previous = _last_month.get(user_id)
+    delta = None
+    if previous is not None and previous["month"] == month["month"]:
+        delta = {key: round(month[key] - previous[key], 2) for key in month if key != "month"}
+    if _subscribers.get(user_id):
+        _last_month[user_id] = month
+
+    return {
+        "type": "ledger",
+        "version": snapshot.version if snapshot else 0,
+        "balance": {
+            "total_income": round(income, 2),
+            "total_expense": round(expense, 2),
+            "total_saving": round(saving, 2),
+            "balance": round(income - expense - saving, 2),
+        },
+        "month": month,
+        "delta": delta,
+    }
+
+
+# ---------------- fan-out ----------------
+
+def _dispatch(user_id: int):
+    """
+    A committed change for `user_id`, from any worker; runs on the event loop.
+    """
+    if not _subscribers.get(user_id):
+        return
+    if user_id in _refreshing:
+        _refreshing[user_id] = True
+        return
+    _refreshing[user_id] = False
+    task = asyncio.get_running_loop().create_task(_refresh(user_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def _refresh(user_id: int):
+    try:
+        while True:
+            payload = await load_event(user_id)
+            for subscription in list(_subscribers.get(user_id, ())):
+                subscription.put(payload)
+            if not _refreshing.get(user_id):
+                break
+            _refreshing[user_id] = False
+    except Exception:
+        logger.exception(f"Loading the live ledger state of user {user_id} failed")
+    finally:
+        _refreshing.pop(user_id, None)
+
+
+@asynccontextmanager
+async def subscription(user_id: int, transport: str):
+    """
+    Subscribe a connection to `user_id`'s changes; the first event is the current state.
+    """
+    sub = Subscription(user_id)
+    _subscribers[user_id].add(sub)
+    live_connections.inc(transport=transport)
+    try:
+        sub.put(await load_event(user_id))
+        yield sub
+    finally:
+        live_connections.dec(transport=transport)
+        _subscribers[user_id].discard(sub)
+        if not _subscribers[user_id]:
+            del _subscribers[user_id]
+            _last_month.pop(user_id, None)
+
+
+# ---------------- publishing ----------------
+
+def mark_changed(db, user_id: int):
+    """
+    Publish a change for `user_id` once `db`'s current transaction commits.
+    """
+    db.sync_session.info.setdefault(_CHANGED_USERS, set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    if session.in_nested_transaction():
+        return  # a SAVEPOINT (app/categories.py) released; the request hasn't committed yet
+    user_ids = session.info.pop(_CHANGED_USERS, None)
+    if user_ids and _loop is not None and _backend is not None:
+        # after_commit runs in a threadpool worker in DB_MODE=sync. A fresh context keeps the
+        # fan-out's reads out of the committing request's query stats and budget.
+        _loop.call_soon_threadsafe(_backend.publish, user_ids, context=contextvars.Context())
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    if session.in_nested_transaction():
+        return
+    session.info.pop(_CHANGED_USERS, None)
+
+
+class MemoryBackend:
+    """
+    Delivers changes to this process's connections only.
+    """
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def publish(self, user_ids):
+        for user_id in user_ids:
+            _dispatch(user_id)
+
+
+class PostgresBackend:
+    """
+    NOTIFY on LIVE_CHANNEL for every change; LISTEN on it for every worker's changes, this one's
+    included. Uses one dedicated asyncpg connection, re-established if it drops. Changes
+    published while it is down are lost; clients catch up with the next one.
+    """
+
+    RECONNECT_SECONDS = 2.0
+
+    def __init__(self):
+        self._pending = asyncio.Queue()
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def publish(self, user_ids):
+        self._pending.put_nowait(user_ids)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        for user_id in payload.split(","):
+            _dispatch(int(user_id))
+
+    async def _run(self):
+        import asyncpg  # only needed with this backend
+
+        dsn = make_url(database.SQLALCHEMY_DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+                try:
+                    await connection.add_listener(LIVE_CHANNEL, self._on_notify)
+                    logger.info(f"Listening for ledger changes on {LIVE_CHANNEL}")
+                    while True:
+                        try:
+                            user_ids = await asyncio.wait_for(self._pending.get(), LIVE_HEARTBEAT_SECONDS)
+                        except asyncio.TimeoutError:
+                            await connection.execute("SELECT 1")  # notice a dead connection while idle
+                            continue
+                        await connection.execute(
+                            "SELECT pg_notify($1, $2)", LIVE_CHANNEL, ",".join(str(user_id) for user_id in sorted(user_ids))
+                        )
+                finally:
+                    await connection.close(timeout=5)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Ledger change listener lost its connection, retrying: {e}")
+                await asyncio.sleep(self.RECONNECT_SECONDS)
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "postgres": PostgresBackend,
+}
+
+
+async def start():
+    global _loop, _backend
+    if LIVE_BACKEND not in BACKENDS:
+        raise ValueError(f"LIVE_BACKEND must be one of {', '.join(BACKENDS)}, got {LIVE_BACKEND!r}")
+    _loop = asyncio.get_running_loop()
+    _backend = BACKENDS[LIVE_BACKEND]()
+    await _backend.start()
+
+
+async def stop():
+    global _backend
+    if _backend is not None:
+        await _backend.stop()
+        _backend = None
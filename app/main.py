@@ -1,23 +1,49 @@
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine
-from app import models
-import psycopg2
-from psycopg2.extras import RealDictCursor 
+import asyncio
+import logging
+from app import database, live, partitions
+from app.instrumentation import RequestMetricsMiddleware
 from app.routes import expenses,income, savings  # your routes go here
-from . import models
 from app.routes import balance
 from app.routes import summary
 from app.routes import auth
+from app.routes import export
+from app.routes import imports
+from app.routes import metrics
+from app.routes import analytics
+from app.routes import search
+from app.routes import stream
 
 
 
 
-# Create database tables from models
-models.Base.metadata.create_all(bind=engine)
+# Database resources live for the lifetime of the app, not of the import.
+# The schema is managed by Alembic (`alembic upgrade head`), not created here.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database.init_engines()
+    await database.warm_pool()
+    try:
+        # Postgres only: make sure the coming months' ledger partitions exist (see app/partitions.py)
+        await partitions.ensure_future_partitions_async()
+    except Exception:
+        # rows still land in the default partition; the maintenance task retries
+        logging.getLogger(__name__).exception("Creating future ledger partitions failed")
+    partition_task = asyncio.create_task(partitions.maintain_partitions())
+    # Pushes ledger changes to /ws/ledger and /ledger/stream clients (see app/live.py)
+    await live.start()
+    yield
+    await live.stop()
+    partition_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await partition_task
+    await database.dispose_engines()
+
 
 # Initialize FastAPI
-app = FastAPI(title="Expense Tracker")
+app = FastAPI(title="Expense Tracker", lifespan=lifespan)
 
 # Allow frontend connections (CORS)
 origins = [
@@ -33,17 +59,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-while True:
-    try:
-        conn= psycopg2.connect(host="db",database="FASTAPI", user="postgres", password="FF66fK0=", cursor_factory=RealDictCursor) #connect to the PostgreSQL database    
-        cursor= conn.cursor() #create a cursor to execute SQL queries
-        print("Connection to database successful")
-        break
-    except Exception as e: #if connection fails, print the error and try again
-        print("Connection to database failed, retrying...")
-        print("Error:", e)
-        break
-        time.sleep(2) #wait for 2 seconds before retrying
+# Per-route latency, status codes, in-flight requests and SQL per request, served on /metrics
+app.add_middleware(RequestMetricsMiddleware)
 
 # Basic root route
 @app.get("/")
@@ -57,6 +74,12 @@ app.include_router(savings.router)
 app.include_router(balance.router)
 app.include_router(summary.router)
 app.include_router(auth.router)
+app.include_router(export.router)
+app.include_router(imports.router)
+app.include_router(metrics.router)
+app.include_router(analytics.router)
+app.include_router(search.router)
+app.include_router(stream.router)
 
 
 
@@ -1,22 +1,66 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime,text,ForeignKey
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, DateTime, Date,text,ForeignKey, ForeignKeyConstraint, Index, UniqueConstraint
+from sqlalchemy import DDL, event, func, literal_column
 from sqlalchemy.orm import relationship
 
 from datetime import datetime
 from sqlalchemy.sql.sqltypes import TIMESTAMP
 from .database import Base
 
+class Category(Base):
+    __tablename__ = "categories"
+
+    # Expense categories, numbered per user (1, 2, 3, ...); expenses store the small id, not the name
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    id = Column(SmallInteger, primary_key=True, autoincrement=False)
+    name = Column(String, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "name", name="uq_categories_user_id_name"),
+    )
+
+
+def note_tsvector(column):
+    # Postgres full-text document for a note; literal arguments (not bind parameters) so queries
+    # match the expression of the ix_*_note_tsv indexes (migration a9d3e6f2c8b4)
+    return func.to_tsvector(literal_column("'simple'"), func.coalesce(column, literal_column("''")))
+
+
+def _note_search_indexes(table: str, column):
+    # Postgres only: GIN over the tsvector and over trigrams (pg_trgm) for fuzzy matches
+    return (
+        Index(f"ix_{table}_note_tsv", note_tsvector(column), postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index(
+            f"ix_{table}_note_trgm", column, postgresql_using="gin", postgresql_ops={column.name: "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+# On Postgres the three ledger tables are range-partitioned by month on "timestamp" (migration
+# e2d5f8a1b396, app/partitions.py), and their primary key there is (id, timestamp). id alone is
+# still unique (one sequence per table), so the ORM keeps identifying rows by id.
+
 class Expense(Base):
     __tablename__ = "expenses"
 
     id = Column(Integer, primary_key=True, index=True)
     Note = Column(String, nullable=True)
     amount = Column(Float, nullable=False)
-    category = Column(String, nullable=False)
+    category_id = Column(SmallInteger, nullable=True)  # categories.id for this user; names come from app/categories.py
     timestamp =  Column(TIMESTAMP(timezone=True), server_default= (text('now()')), nullable=False)  #define the created_at column as a timestamp with timezone and default to current time
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # this links to the users table
 
     user = relationship("User", back_populates="expenses")  # change this for each model accordingly
 
+    __mapper_args__ = {"eager_defaults": True}  # load the server-side timestamp on flush (needed by the ledger rollups)
+    __table_args__ = (
+        # per-user time ranges and keyset pages (timestamp, id)
+        Index("ix_expenses_user_id_timestamp", "user_id", "timestamp", "id"),
+        # per-user category filters / grouping within a time range
+        Index("ix_expenses_user_id_category_id_timestamp", "user_id", "category_id", "timestamp"),
+        ForeignKeyConstraint(["user_id", "category_id"], ["categories.user_id", "categories.id"]),
+        *_note_search_indexes("expenses", Note),
+    )
+
 
 class Income(Base):
     __tablename__ = "incomes"
@@ -28,6 +72,12 @@ class Income(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # this links to the users table
     user = relationship("User", back_populates="incomes")  # this gives access to the full user object
 
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        Index("ix_incomes_user_id_timestamp", "user_id", "timestamp", "id"),
+        *_note_search_indexes("incomes", note),
+    )
+
 
 class Saving(Base):
     __tablename__ = "savings"
@@ -39,6 +89,11 @@ class Saving(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # this links to the users table
     user = relationship("User", back_populates="savings")  # this gives access to the full user object
 
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        Index("ix_savings_user_id_timestamp", "user_id", "timestamp", "id"),
+    )
+
 
 class User(Base):
     __tablename__ = "users"
@@ -53,3 +108,30 @@ class User(Base):
     expenses = relationship("Expense", back_populates="user")
     incomes = relationship("Income", back_populates="user")
     savings = relationship("Saving", back_populates="user")
+
+
+class MonthlyRollup(Base):
+    __tablename__ = "monthly_rollups"
+
+    # One row per user and calendar month, kept in sync by app/ledger.py on every ledger write
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the month
+    income = Column(Float, nullable=False, server_default=text('0'))
+    expense = Column(Float, nullable=False, server_default=text('0'))
+    saving = Column(Float, nullable=False, server_default=text('0'))
+    entries = Column(Integer, nullable=False, server_default=text('0'))  # number of ledger rows in this month
+
+
+class BalanceSnapshot(Base):
+    __tablename__ = "balance_snapshots"
+
+    # Running totals per user, kept in sync by app/ledger.py on every ledger write
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    total_income = Column(Float, nullable=False, server_default=text('0'))
+    total_expense = Column(Float, nullable=False, server_default=text('0'))
+    total_saving = Column(Float, nullable=False, server_default=text('0'))
+    version = Column(Integer, nullable=False, server_default=text('0'))  # bumped on every ledger write
+
+
+# create_all() on Postgres needs pg_trgm before the trigram indexes
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
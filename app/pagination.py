@@ -0,0 +1,51 @@
+# pagination.py
+# Keyset (cursor) pagination over the ledger tables, newest first by (timestamp, id).
+# The cursor is an opaque url-safe token holding the (timestamp, id) of the last row of a page;
+# the next page continues strictly after it, so rows inserted meanwhile never shift later pages
+# and no OFFSET scan is needed.
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(timestamp: datetime, id: int) -> str:
+    raw = json.dumps([timestamp.isoformat(), id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_page(stmt, model, limit: int, cursor: str | None = None):
+    """
+    Restrict `stmt` to one page of `model` rows after `cursor`. Fetches limit + 1 rows so
+    split_page() can tell whether another page exists.
+    """
+    if cursor:
+        timestamp, id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(model.timestamp, model.id) < tuple_(timestamp, id))
+    return stmt.order_by(model.timestamp.desc(), model.id.desc()).limit(limit + 1)
+
+
+def split_page(rows, limit: int):
+    """
+    (items, next_cursor) for rows fetched with keyset_page().
+    """
+    items = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+    return items, next_cursor
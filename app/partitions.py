@@ -0,0 +1,132 @@
+# partitions.py
+# Monthly range partitions of the ledger tables on Postgres (see migration e2d5f8a1b396).
+#
+# expenses, incomes and savings are PARTITION BY RANGE ("timestamp") with one partition per UTC
+# calendar month, named <table>_pYYYY_MM, plus a <table>_default partition that catches anything
+# outside the created range. The app creates the coming months at startup and then every
+# PARTITION_CHECK_INTERVAL_SECONDS, so writes normally never land in the default partition; if
+# some did (a backdated import, say), creating that month moves them out of it first.
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+PARTITIONED_TABLES = ("expenses", "incomes", "savings")
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_CHECK_INTERVAL_SECONDS = float(os.getenv("PARTITION_CHECK_INTERVAL_SECONDS", str(6 * 3600)))
+
+# pg_advisory_xact_lock key, so several workers starting at once don't race on the DDL
+_ADVISORY_LOCK_KEY = 7_310_112_017
+
+logger = logging.getLogger(__name__)
+
+
+def month_floor(value: date | datetime) -> date:
+    # Partition bounds are UTC months; an aware timestamp (e.g. a timestamptz read in the session's
+    # timezone) belongs to the UTC month it falls in
+    if isinstance(value, datetime) and value.tzinfo:
+        value = value.astimezone(timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def _bound(month: date) -> str:
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def is_partitioned(connection, table: str) -> bool:
+    relkind = connection.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+    ).scalar()
+    return relkind == "p"
+
+
+def create_month_partition(connection, table: str, month: date) -> bool:
+    """
+    Create the partition of `table` for `month` unless it exists. Returns True if it was created.
+    """
+    name = partition_name(table, month)
+    if connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return False
+
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    # Build it detached, move any rows the default partition caught for this month into it, then
+    # attach: CREATE ... PARTITION OF would fail if the default partition held rows in the range.
+    connection.execute(text(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    connection.execute(text(
+        f'WITH moved AS (DELETE FROM "{table}_default" '
+        f'WHERE "timestamp" >= {lower} AND "timestamp" < {upper} RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved'
+    ))
+    connection.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" FOR VALUES FROM ({lower}) TO ({upper})'))
+    return True
+
+
+def ensure_partitions(connection, first_month: date, last_month: date, tables=PARTITIONED_TABLES) -> list[str]:
+    """
+    Create every missing monthly partition from `first_month` through `last_month` (inclusive),
+    on a sync Connection inside a transaction. Returns the names of the created partitions.
+    """
+    if connection.dialect.name != "postgresql":
+        return []
+    connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+
+    created = []
+    for table in tables:
+        if not is_partitioned(connection, table):
+            continue
+        month = month_floor(first_month)
+        while month <= last_month:
+            if create_month_partition(connection, table, month):
+                created.append(partition_name(table, month))
+            month = add_months(month, 1)
+    return created
+
+
+def ensure_future_partitions(connection, months_ahead: int = PARTITION_MONTHS_AHEAD) -> list[str]:
+    this_month = month_floor(datetime.now(timezone.utc))
+    return ensure_partitions(connection, this_month, add_months(this_month, months_ahead))
+
+
+async def ensure_future_partitions_async(months_ahead: int = PARTITION_MONTHS_AHEAD) -> list[str]:
+    """
+    ensure_future_partitions() on the app's engine, for the configured DB_MODE.
+    """
+    from app import database
+
+    if database.async_engine is not None:
+        async with database.async_engine.begin() as connection:
+            created = await connection.run_sync(ensure_future_partitions, months_ahead)
+    else:
+        def _ensure():
+            with database.engine.begin() as connection:
+                return ensure_future_partitions(connection, months_ahead)
+
+        created = await run_in_threadpool(_ensure)
+
+    if created:
+        logger.info(f"Created ledger partitions: {', '.join(created)}")
+    return created
+
+
+async def maintain_partitions(interval: float = PARTITION_CHECK_INTERVAL_SECONDS):
+    """
+    Background task started by the app lifespan: keeps PARTITION_MONTHS_AHEAD months created.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await ensure_future_partitions_async()
+        except Exception:
+            logger.exception("Creating future ledger partitions failed; will retry")
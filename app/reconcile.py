@@ -0,0 +1,131 @@
+# reconcile.py
+# Recomputes the per-user balance snapshots from the raw ledger tables and reports any drift.
+#
+#   python -m app.reconcile                 # report only, exit code 1 if drift was found
+#   python -m app.reconcile --fix           # also rewrite the drifted snapshots
+#   python -m app.reconcile --user-id 42    # check a single user
+import argparse
+import logging
+import sys
+from typing import NamedTuple, Optional
+
+from sqlalchemy import func, literal, select, union_all, update
+from sqlalchemy.orm import Session
+
+from app.models import BalanceSnapshot, Expense, Income, Saving
+
+logger = logging.getLogger(__name__)
+
+
+class Drift(NamedTuple):
+    user_id: int
+    expected: tuple  # (income, expense, saving) recomputed from the ledgers
+    actual: Optional[tuple]  # what the snapshot says, None if there is no snapshot row
+
+
+def compute_balances(db: Session, user_id: int | None = None) -> dict:
+    """
+    {user_id: (total_income, total_expense, total_saving)} from one grouped pass over the ledgers.
+    """
+    parts = []
+    for model, field in ((Income, "income"), (Expense, "expense"), (Saving, "saving")):
+        stmt = select(
+            model.user_id.label("user_id"),
+            (model.amount if field == "income" else literal(0.0)).label("income"),
+            (model.amount if field == "expense" else literal(0.0)).label("expense"),
+            (model.amount if field == "saving" else literal(0.0)).label("saving"),
+        ).where(model.user_id.is_not(None))
+        if user_id is not None:
+            stmt = stmt.where(model.user_id == user_id)
+        parts.append(stmt)
+
+    ledger = union_all(*parts).subquery()
+    rows = db.execute(
+        select(
+            ledger.c.user_id,
+            func.sum(ledger.c.income),
+            func.sum(ledger.c.expense),
+            func.sum(ledger.c.saving),
+        ).group_by(ledger.c.user_id)
+    ).all()
+    return {row[0]: (row[1] or 0.0, row[2] or 0.0, row[3] or 0.0) for row in rows}
+
+
+def find_drift(db: Session, user_id: int | None = None, tolerance: float = 0.005) -> list[Drift]:
+    expected = compute_balances(db, user_id)
+
+    stmt = select(BalanceSnapshot)
+    if user_id is not None:
+        stmt = stmt.where(BalanceSnapshot.user_id == user_id)
+    snapshots = {
+        s.user_id: (s.total_income, s.total_expense, s.total_saving)
+        for s in db.execute(stmt).scalars()
+    }
+
+    drifts = []
+    for uid in sorted(set(expected) | set(snapshots)):
+        want = expected.get(uid, (0.0, 0.0, 0.0))
+        have = snapshots.get(uid)
+        if have is None:
+            if any(want):
+                drifts.append(Drift(uid, want, None))
+            continue
+        if any(abs(w - h) > tolerance for w, h in zip(want, have)):
+            drifts.append(Drift(uid, want, have))
+    return drifts
+
+
+def fix_drift(db: Session, drifts: list[Drift]):
+    for drift in drifts:
+        income, expense, saving = drift.expected
+        if drift.actual is None:
+            db.add(BalanceSnapshot(
+                user_id=drift.user_id,
+                total_income=income,
+                total_expense=expense,
+                total_saving=saving,
+                version=1,
+            ))
+        else:
+            db.execute(
+                update(BalanceSnapshot)
+                .where(BalanceSnapshot.user_id == drift.user_id)
+                .values(
+                    total_income=income,
+                    total_expense=expense,
+                    total_saving=saving,
+                    version=BalanceSnapshot.version + 1,
+                )
+            )
+    db.commit()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Reconcile balance snapshots against the ledger tables")
+    parser.add_argument("--fix", action="store_true", help="rewrite drifted snapshots")
+    parser.add_argument("--user-id", type=int, default=None, help="only check this user")
+    parser.add_argument("--tolerance", type=float, default=0.005, help="allowed absolute difference per total")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    from app import database
+
+    database.init_engines()
+    db = database.SessionLocal()
+    try:
+        drifts = find_drift(db, args.user_id, args.tolerance)
+        for drift in drifts:
+            logger.warning(f"Drift for user {drift.user_id}: snapshot={drift.actual} ledger={drift.expected}")
+        logger.info(f"{len(drifts)} snapshot(s) drifted")
+
+        if drifts and args.fix:
+            fix_drift(db, drifts)
+            logger.info(f"Rewrote {len(drifts)} snapshot(s)")
+            return 0
+        return 1 if drifts else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
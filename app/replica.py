@@ -0,0 +1,109 @@
+# replica.py
+# Routes the read-only GET endpoints to the read replica (SQLALCHEMY_READ_DATABASE_URL).
+#
+# A replica lags the primary a little, so a user who just wrote would otherwise not see their own
+# change. Every ledger write marks its user (see app/ledger.py) and for READ_YOUR_WRITES_SECONDS
+# afterwards that user's reads stay on the primary. The marker lives in this process only: with
+# several workers, it covers the worker that took the write, which is why the window should stay
+# comfortably above the replica's usual lag rather than be tuned down to it.
+# If the replica can't hand out a connection, reads go to the primary and the replica is left
+# alone for REPLICA_RETRY_SECONDS before it is tried again.
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import Depends
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+
+from app import database, metrics
+from app.auth_utils import Principal, get_current_user
+from app.cache import LRUCache
+
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+READ_YOUR_WRITES_CACHE_SIZE = int(os.getenv("READ_YOUR_WRITES_CACHE_SIZE", "100000"))
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+logger = logging.getLogger(__name__)
+
+_recent_writers = LRUCache(maxsize=READ_YOUR_WRITES_CACHE_SIZE, ttl=READ_YOUR_WRITES_SECONDS)  # user id -> True
+_replica_down_until = 0.0
+
+reads_total = metrics.Counter(
+    "db_read_sessions_total",
+    "Read-only request sessions by the database that served them and why",
+    labelnames=("target", "reason"),
+)
+
+
+def mark_user_write(user_id: int):
+    if READ_YOUR_WRITES_SECONDS > 0:
+        _recent_writers.set(user_id, True)
+
+
+def wrote_recently(user_id: int) -> bool:
+    return _recent_writers.get(user_id) is not None
+
+
+def replica_available() -> bool:
+    return database.has_replica() and time.monotonic() >= _replica_down_until
+
+
+async def _open_replica_session():
+    """
+    A replica session with a live connection, or None (and the replica benched) if it can't connect.
+    """
+    global _replica_down_until
+    db = database.new_read_session()
+    try:
+        await db.connection()
+    except (DBAPIError, PoolTimeoutError, OSError, asyncio.TimeoutError) as e:
+        await db.close()
+        _replica_down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+        logger.warning(f"Read replica unavailable, using the primary for {REPLICA_RETRY_SECONDS:.0f}s: {e}")
+        return None
+    return db
+
+
+@asynccontextmanager
+async def read_session_scope(user_id: int):
+    """
+    A session for read-only work on behalf of `user_id`: the replica unless the user wrote
+    recently or the replica is unavailable, otherwise the primary.
+    """
+    db = None
+    if not database.has_replica():
+        reason = "no_replica"
+    elif wrote_recently(user_id):
+        reason = "recent_write"
+    elif not replica_available():
+        reason = "unavailable"
+    else:
+        db = await _open_replica_session()
+        reason = "replica" if db is not None else "unavailable"
+
+    reads_total.inc(target="replica" if db is not None else "primary", reason=reason)
+    if db is None:
+        db = database.new_session()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def get_read_db(current_user: Principal = Depends(get_current_user)):
+    async with read_session_scope(current_user.id) as db:
+        yield db
+
+
+def routing_stats() -> dict:
+    return {
+        f"{target}:{reason}": reads_total.value(target=target, reason=reason)
+        for target, reason in (
+            ("replica", "replica"),
+            ("primary", "recent_write"),
+            ("primary", "unavailable"),
+            ("primary", "no_replica"),
+        )
+    }
@@ -0,0 +1,156 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Literal, Optional
+from datetime import datetime, timedelta, timezone
+import logging
+
+import orjson
+
+from app import analytics, categories
+from app.auth_utils import get_current_user
+from app.http_cache import conditional_get
+from app.instrumentation import query_budget
+from app.models import User
+from app.replica import get_read_db
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+logger = logging.getLogger(__name__)
+
+
+def _json_response(result, response: Response):
+    # conditional_get hands back a ready 304 or the cached/computed body bytes
+    if isinstance(result, Response):
+        return result
+    return Response(content=result, media_type="application/json", headers=dict(response.headers))
+
+
+# ✅ Time series of one ledger, bucketed by day/week/month, with rolling statistics
+# (principal, data version, category id on a cold cache, bucket totals)
+@router.get("/series", dependencies=[Depends(query_budget(4))])
+async def get_series(
+    request: Request,
+    response: Response,
+    bucket: Literal["day", "week", "month"] = Query("day"),
+    metric: Literal["expense", "income", "saving"] = Query("expense"),
+    category: Optional[str] = Query(None, description="expense category; only with metric=expense"),
+    start_date: Optional[datetime] = Query(None, description="defaults to one year before end_date"),
+    end_date: Optional[datetime] = Query(None, description="defaults to now"),
+    window: int = Query(7, ge=1, le=366, description="buckets in the rolling mean"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    end = analytics.as_utc(end_date) if end_date else datetime.now(timezone.utc)
+    start = analytics.as_utc(start_date) if start_date else end - timedelta(days=365)
+    if start > end:
+        raise HTTPException(status_code=400, detail="Invalid date range: start_date cannot be after end_date")
+    if category is not None and metric != "expense":
+        raise HTTPException(status_code=400, detail="category can only be used with metric=expense")
+    if analytics.bucket_count(bucket, start, end) > analytics.MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range too long: at most {analytics.MAX_BUCKETS} {bucket} buckets")
+
+    logger.info(f"User {current_user.id} requested {bucket} {metric} series from {start} to {end}")
+
+    async def compute():
+        category_id = None
+        if category is not None:
+            category_id = await categories.lookup_id(db, current_user.id, category)
+        if category is None or category_id is not None:
+            buckets, totals, counts = await analytics.bucket_totals(
+                db, current_user.id, analytics.METRICS[metric], bucket, start, end, category_id
+            )
+        else:
+            buckets, totals, counts = [], [], []  # a category the user never used
+        series = analytics.build_series(bucket, start, end, buckets, totals, counts, window)
+        return orjson.dumps(
+            {
+                "bucket": bucket,
+                "metric": metric,
+                "category": category,
+                "start_date": start,
+                "end_date": end,
+                "window": window,
+                "series": series,
+            },
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z,
+        )
+
+    result = await conditional_get(
+        request, response, db, current_user.id, "analytics/series",
+        (bucket, metric, category, start.isoformat(), end.isoformat(), window),
+        compute,
+    )
+    return _json_response(result, response)
+
+
+# ✅ Per-category spending statistics with outlier flags
+# (principal, data version, the range's amounts, category names on a cold cache)
+@router.get("/categories/stats", dependencies=[Depends(query_budget(4))])
+async def get_category_stats(
+    request: Request,
+    response: Response,
+    start_date: datetime = Query(...),
+    end_date: datetime = Query(...),
+    method: Literal["zscore", "iqr"] = Query("zscore"),
+    threshold: Optional[float] = Query(None, gt=0, description="defaults to 3 for zscore, 1.5 for iqr"),
+    max_outliers: int = Query(100, ge=0, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    start, end = analytics.as_utc(start_date), analytics.as_utc(end_date)
+    if start > end:
+        raise HTTPException(status_code=400, detail="Invalid date range: start_date cannot be after end_date")
+    if threshold is None:
+        threshold = 1.5 if method == "iqr" else 3.0
+
+    logger.info(f"User {current_user.id} requested category stats from {start} to {end} ({method} > {threshold})")
+
+    async def compute():
+        ids, category_ids, amounts, timestamps = await analytics.expense_columns(db, current_user.id, start, end)
+        stats = analytics.category_stats(category_ids, amounts, method, threshold)
+        names = await categories.names_for(db, current_user.id, stats["category_ids"].tolist())
+
+        rows = zip(*(stats[key].tolist() for key in ("category_ids", "count", "total", "mean", "median", "p90", "std", "outliers")))
+        category_rows = [
+            {
+                "category": names.get(category_id, ""),
+                "count": count,
+                "total_amount": total,
+                "mean": mean,
+                "median": median,
+                "p90": p90,
+                "std": std,
+                "outliers": outliers,
+            }
+            for category_id, count, total, mean, median, p90, std, outliers in rows
+        ]
+        outlier_rows = stats["outlier_rows"][:max_outliers].tolist()
+        outlier_scores = stats["outlier_scores"][:max_outliers].tolist()
+        outliers = [
+            {
+                "id": ids[row],
+                "category": names.get(int(category_ids[row]), ""),
+                "amount": float(amounts[row]),
+                "timestamp": timestamps[row],
+                "score": score,
+            }
+            for row, score in zip(outlier_rows, outlier_scores)
+        ]
+        return orjson.dumps(
+            {
+                "start_date": start,
+                "end_date": end,
+                "method": method,
+                "threshold": threshold,
+                "total_amount": float(amounts.sum()),
+                "categories": category_rows,
+                "outliers": outliers,
+            },
+            option=orjson.OPT_UTC_Z,
+        )
+
+    result = await conditional_get(
+        request, response, db, current_user.id, "analytics/categories/stats",
+        (start.isoformat(), end.isoformat(), method, threshold, max_outliers),
+        compute,
+    )
+    return _json_response(result, response)
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 from app import models, database,auth_utils
 from app import models, schemas 
@@ -8,6 +9,7 @@ import logging
 from datetime import timedelta
 from app.auth_utils import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from app.auth_utils import get_current_user_from_bearer
+from app.instrumentation import query_budget
 
 
 
@@ -18,28 +20,50 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-@router.post("/register", response_model=schemas.UserOut)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def _get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
+
+
+async def _authenticate(db: AsyncSession, email: str, password: str):
+    user = await _get_user_by_email(db, email)
+    if not user:
+        return None
+
+    valid, new_hash = await auth_utils.verify_and_update_password(password, user.password)
+    if not valid:
+        return None
+
+    if new_hash:
+        # bcrypt cost changed since this hash was made: store the upgraded hash
+        user.password = new_hash
+        await db.commit()
+        logger.info(f"Rehashed password for user id={user.id} with the current bcrypt cost")
+    return user
+
+
+@router.post("/register", response_model=schemas.UserOut, dependencies=[Depends(query_budget(3))])
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await _get_user_by_email(db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_pw = auth_utils.hash_password(user.password)
+    hashed_pw = await auth_utils.hash_password_async(user.password)
     new_user = models.User(username=user.username, email=user.email, password=hashed_pw)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     # ✅ LOG the registration (no password!)
     logger.info(f"New user registered: username={new_user.username}, email={new_user.email}")
 
     return new_user
 
-@router.post("/login")
-def login_user(login_data: schemas.UserLogin, db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.email == login_data.email).first()
+@router.post("/login", dependencies=[Depends(query_budget(2))])
+async def login_user(login_data: schemas.UserLogin, db: AsyncSession = Depends(database.get_db)):
+    user = await _authenticate(db, login_data.email, login_data.password)
 
-    if not user or not auth_utils.verify_password(login_data.password, user.password):
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
@@ -61,11 +85,11 @@ def login_user(login_data: schemas.UserLogin, db: Session = Depends(database.get
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-@router.post("/token")
-def login_for_swagger(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
+@router.post("/token", dependencies=[Depends(query_budget(2))])
+async def login_for_swagger(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await _authenticate(db, form_data.username, form_data.password)
 
-    if not user or not auth_utils.verify_password(form_data.password, user.password):
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
@@ -79,6 +103,6 @@ def login_for_swagger(form_data: OAuth2PasswordRequestForm = Depends(), db: Sess
 
     return {"access_token": access_token, "token_type": "bearer"}
 
-@router.get("/protected")
+@router.get("/protected", dependencies=[Depends(query_budget(1))])
 def protected_route(current_user: models.User = Depends(auth_utils.get_current_user)):
     return {"message": f"Hello, {current_user.username}!"}
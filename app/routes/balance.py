@@ -1,34 +1,36 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
-from app.database import get_db
-from app.models import Income, Expense, Saving, User
+from app.replica import get_read_db
+from app.models import BalanceSnapshot, User
 from app.auth_utils import get_current_user
+from app.http_cache import check_not_modified
+from app.instrumentation import query_budget
 
 router = APIRouter(prefix="/balance", tags=["Balance"])
 
 logger = logging.getLogger(__name__)
 
-@router.get("/")
-def get_balance(
-    db: Session = Depends(get_db),
+@router.get("/", dependencies=[Depends(query_budget(2))])
+async def get_balance(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     logger.info(f"User {current_user.id} requested balance")
 
-    total_income = db.query(func.coalesce(func.sum(Income.amount), 0.0)).filter(
-        Income.user_id == current_user.id
-    ).scalar()
+    # Single primary-key lookup; the snapshot is maintained by app/ledger.py on every write
+    snapshot = await db.get(BalanceSnapshot, current_user.id)
 
-    total_expense = db.query(func.coalesce(func.sum(Expense.amount), 0.0)).filter(
-        Expense.user_id == current_user.id
-    ).scalar()
+    not_modified = check_not_modified(request, response, current_user.id, snapshot.version if snapshot else 0)
+    if not_modified is not None:
+        return not_modified
 
-    total_saving = db.query(func.coalesce(func.sum(Saving.amount), 0.0)).filter(
-        Saving.user_id == current_user.id
-    ).scalar()
+    total_income = snapshot.total_income if snapshot else 0.0
+    total_expense = snapshot.total_expense if snapshot else 0.0
+    total_saving = snapshot.total_saving if snapshot else 0.0
 
     balance = total_income - total_expense - total_saving
 
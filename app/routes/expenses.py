@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
-from sqlalchemy.orm import Session
-from typing import List
-from app import models, schemas, crud, auth_utils
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app import models, schemas, crud, auth_utils, ledger, fastjson, categories
+from app.http_cache import conditional_get
+from app.instrumentation import query_budget
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, split_page
 from app.database import get_db
+from app.replica import get_read_db
 from datetime import datetime
-from sqlalchemy import func
+from sqlalchemy import select
 from app.models import Expense
 import logging
 
@@ -15,41 +19,77 @@ router = APIRouter(
 
 logger = logging.getLogger(__name__)
 
+# columns selected for the list endpoint, in schemas.Expenseout field order
+EXPENSE_FIELDS, EXPENSE_COLUMNS = fastjson.schema_columns(Expense, schemas.Expenseout, category=categories.CATEGORY_NAME)
 
-# ✅ GET all expenses (for current user)
-@router.get("/", response_model=List[schemas.Expenseout])
-def get_expenses(
-    db: Session = Depends(get_db),
+
+def _expense_out(expense: Expense, category: str) -> dict:
+    return {
+        "id": expense.id,
+        "Note": expense.Note,
+        "amount": expense.amount,
+        "category": category,
+        "timestamp": expense.timestamp,
+    }
+
+
+# ✅ GET expenses (for current user), newest first, one page at a time
+@router.get("/", response_model=schemas.ExpensePage, dependencies=[Depends(query_budget(2))])
+async def get_expenses(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
     current_user: models.User = Depends(auth_utils.get_current_user)
 ):
-    logger.info(f"User {current_user.id} requested all expenses")
-    return db.query(Expense).filter(Expense.user_id == current_user.id).all()
+    logger.info(f"User {current_user.id} requested expenses page (limit={limit})")
+    result = await db.execute(crud.ledger_page_query(Expense, EXPENSE_COLUMNS, current_user.id, limit, cursor))
+    rows, next_cursor = split_page(result.all(), limit)
+    return fastjson.page_response(rows, EXPENSE_FIELDS, next_cursor)
 
 
 # ✅ POST new expense
-@router.post("/", response_model=schemas.Expenseout)
-def create_expense(
+# (principal, category lookup, SAVEPOINT + INSERT + RELEASE and a re-read for a new category,
+#  INSERT ... RETURNING, rollup and snapshot upserts, refresh)
+@router.post("/", response_model=schemas.Expenseout, dependencies=[Depends(query_budget(10))])
+async def create_expense(
     expense: schemas.ExpenseCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(auth_utils.get_current_user)
 ):
     new_expense = Expense(
         amount=expense.amount,
-        category=expense.category,
+        category_id=await categories.resolve_id(db, current_user.id, expense.category),
         Note=expense.Note,
         user_id=current_user.id
     )
     db.add(new_expense)
-    db.commit()
-    db.refresh(new_expense)
+    await db.flush()
+    await ledger.record(db, new_expense)
+    await db.commit()
+    await db.refresh(new_expense)
     logger.info(f"Expense created by user {current_user.id}: {new_expense}")
-    return new_expense
+    return _expense_out(new_expense, expense.category)
+
+
+# ✅ POST many expenses at once (offline replay), one statement and one commit
+# (principal, category lookup, SAVEPOINT + INSERT + RELEASE and a re-read for the new categories,
+#  INSERT ... RETURNING (one per row on SQLite, see crud.create_ledger_rows), rollup and snapshot
+#  upserts; rows all get the server's timestamp, so one month)
+@router.post("/batch", response_model=List[schemas.Expenseout], dependencies=[Depends(query_budget(9))])
+async def create_expenses_batch(
+    expenses: List[schemas.ExpenseCreate] = Body(..., min_length=1, max_length=crud.BATCH_MAX_RECORDS),
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(auth_utils.get_current_user)
+):
+    created = await crud.create_ledger_rows(db, Expense, current_user.id, [e.dict() for e in expenses])
+    logger.info(f"User {current_user.id} created {len(created)} expenses in one batch")
+    return created
 
 
 # ✅ GET monthly grouped expenses
 """@router.get("/month", response_model=List[schemas.Expenseout])
 def monthly_expenses(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(auth_utils.get_current_user)
 ):
     logger.info(f"User {current_user.id} requested monthly expenses")
@@ -57,11 +97,15 @@ def monthly_expenses(
 
 
 # ✅ GET expenses summary (GET with query params)
-@router.get("/by_date", response_model=schemas.ExpenseSummary)
-def get_expenses_by_date_range(
+# (principal, range totals, one page of rows)
+@router.get("/by_date", response_model=schemas.ExpenseSummary, dependencies=[Depends(query_budget(3))])
+async def get_expenses_by_date_range(
     start_date: datetime = Query(...),
     end_date: datetime = Query(...),
-    db: Session = Depends(get_db),
+    totals_only: bool = Query(False),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
     current_user: models.User = Depends(auth_utils.get_current_user)
 ):
     if start_date > end_date:
@@ -70,14 +114,19 @@ def get_expenses_by_date_range(
             detail="Invalid date range: start_date cannot be after end_date"
         )
     logger.info(f"User {current_user.id} requested summary from {start_date} to {end_date}")
-    return crud.get_expenses_by_date_range(db, start_date, end_date, user_id=current_user.id)
+    return await crud.get_expenses_by_date_range(
+        db, start_date, end_date, user_id=current_user.id, totals_only=totals_only, limit=limit, cursor=cursor
+    )
 
 
 # ✅ POST summary with date range in body
-@router.post("/by_date", response_model=schemas.ExpenseSummary)
-def get_expenses_by_date_range_post(
+@router.post("/by_date", response_model=schemas.ExpenseSummary, dependencies=[Depends(query_budget(3))])
+async def get_expenses_by_date_range_post(
     date_range: schemas.DateRange,
-    db: Session = Depends(get_db),
+    totals_only: bool = Query(False),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(auth_utils.get_current_user)
 ):
     if date_range.start_date > date_range.end_date:
@@ -86,99 +135,127 @@ def get_expenses_by_date_range_post(
             detail="Invalid date range: start_date cannot be after end_date"
         )
     logger.info(f"User {current_user.id} posted date summary: {date_range}")
-    return crud.get_expenses_by_date_range(db, date_range.start_date, date_range.end_date, user_id=current_user.id)
+    return await crud.get_expenses_by_date_range(
+        db, date_range.start_date, date_range.end_date, user_id=current_user.id,
+        totals_only=totals_only, limit=limit, cursor=cursor
+    )
 
 
 # ✅ Category summary
-@router.get("/all_category", response_model=schemas.CategorySummaryResponse)
-def get_category_summary(
+@router.get("/all_category", response_model=schemas.CategorySummaryResponse, dependencies=[Depends(query_budget(4))])
+async def get_category_summary(
+    request: Request,
+    response: Response,
     start_date: datetime = Query(...),
     end_date: datetime = Query(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: models.User = Depends(auth_utils.get_current_user)
 ):
     logger.info(f"User {current_user.id} requested category summary")
-    summary = (
-        db.query(Expense.category, func.sum(Expense.amount).label("total_amount"))
-        .filter(
-            Expense.user_id == current_user.id,
-            Expense.timestamp >= start_date,
-            Expense.timestamp <= end_date
-        )
-        .group_by(Expense.category)
-        .all()
+    return await conditional_get(
+        request, response, db, current_user.id, "expenses/all_category",
+        (start_date.isoformat(), end_date.isoformat()),
+        lambda: _category_summary(db, current_user.id, start_date, end_date),
     )
-    categories = [{"category": row.category, "total_amount": row.total_amount} for row in summary]
-    total = sum(row["total_amount"] for row in categories)
-    return {"total_amount": total, "categories": categories}
+
+
+async def _category_summary(db: AsyncSession, user_id: int, start_date: datetime, end_date: datetime):
+    # Group on the smallint category_id, then name just the groups
+    summary = (await db.execute(crud.category_totals_query(user_id, start_date, end_date))).all()
+    names = await categories.names_for(db, user_id, [row.category_id for row in summary])
+    totals = [{"category": names.get(row.category_id, ""), "total_amount": row.total_amount} for row in summary]
+    total = sum(row["total_amount"] for row in totals)
+    return {"total_amount": total, "categories": totals}
 
 
 # ✅ Expenses by category
-@router.post("/by-category", response_model=schemas.ExpensesByCategoryResponse)
-def get_expenses_by_category(
+# (principal, category id on a cold cache, range totals, one page of rows)
+@router.post("/by-category", response_model=schemas.ExpensesByCategoryResponse, dependencies=[Depends(query_budget(4))])
+async def get_expenses_by_category(
     payload: schemas.ExpensesByCategoryRequest = Body(...),
-    db: Session = Depends(get_db),
+    totals_only: bool = Query(False),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(auth_utils.get_current_user)
 ):
-    expenses = db.query(Expense).filter(
-        Expense.user_id == current_user.id,
-        Expense.category == payload.category,
-        Expense.timestamp >= payload.start_date,
-        Expense.timestamp <= payload.end_date
-    ).all()
+    category_id = await categories.lookup_id(db, current_user.id, payload.category)
+    if category_id is None:
+        return {"total_amount": 0.0, "count": 0, "expenses": []}
 
-    total = sum(e.amount for e in expenses)
+    total, count, expenses, next_cursor = await crud.get_expense_range(
+        db, current_user.id, payload.start_date, payload.end_date,
+        category_id=category_id, totals_only=totals_only, limit=limit, cursor=cursor,
+    )
 
     return {
         "total_amount": total,
-        "expenses": expenses
+        "count": count,
+        "expenses": expenses,
+        "next_cursor": next_cursor
     }
 
 
 # ✅ GET expense by ID
-@router.get("/{id}", response_model=schemas.Expenseout)
-def get_expense(
+@router.get("/{id}", response_model=schemas.Expenseout, dependencies=[Depends(query_budget(2))])
+async def get_expense(
     id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: models.User = Depends(auth_utils.get_current_user)
 ):
-    expense = db.query(Expense).filter(Expense.id == id, Expense.user_id == current_user.id).first()
-    if not expense:
+    result = await db.execute(
+        categories.join_names(select(Expense, categories.CATEGORY_NAME))
+        .where(Expense.id == id, Expense.user_id == current_user.id)
+    )
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=404, detail="Expense not found")
-    return expense
+    return _expense_out(row.Expense, row.category)
 
 
 # ✅ DELETE expense
-@router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_expense(
+@router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(query_budget(6))])
+async def delete_expense(
     id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(auth_utils.get_current_user)
 ):
-    expense = db.query(Expense).filter(Expense.id == id, Expense.user_id == current_user.id).first()
+    result = await db.execute(select(Expense).where(Expense.id == id, Expense.user_id == current_user.id))
+    expense = result.scalars().first()
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
-    db.delete(expense)
-    db.commit()
+    await ledger.record(db, expense, sign=-1)
+    await db.delete(expense)
+    await db.commit()
     logger.info(f"User {current_user.id} deleted expense {id}")
     return
 
 
 # ✅ UPDATE expense
-@router.put("/{id}", response_model=schemas.Expenseout)
-def update_expense(
+# (principal, the row, category lookup, SAVEPOINT + INSERT + RELEASE and a re-read for a new
+#  category, reversing the old amounts (3), UPDATE, adding the new ones (2), refresh)
+@router.put("/{id}", response_model=schemas.Expenseout, dependencies=[Depends(query_budget(14))])
+async def update_expense(
     id: int,
     updated_expense: schemas.ExpenseCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(auth_utils.get_current_user)
 ):
-    expense_query = db.query(Expense).filter(Expense.id == id, Expense.user_id == current_user.id)
-    existing_expense = expense_query.first()
+    result = await db.execute(select(Expense).where(Expense.id == id, Expense.user_id == current_user.id))
+    existing_expense = result.scalars().first()
     if not existing_expense:
         raise HTTPException(status_code=404, detail="Expense not found")
 
-    expense_query.update(updated_expense.dict(), synchronize_session=False)
-    db.commit()
-    updated = expense_query.first()
+    values = updated_expense.dict()
+    category = values.pop("category")
+    values["category_id"] = await categories.resolve_id(db, current_user.id, category)
+
+    await ledger.record(db, existing_expense, sign=-1)
+    for key, value in values.items():
+        setattr(existing_expense, key, value)
+    await db.flush()
+    await ledger.record(db, existing_expense)
+    await db.commit()
+    await db.refresh(existing_expense)
     logger.info(f"User {current_user.id} updated expense {id}")
-    return updated
+    return _expense_out(existing_expense, category)
@@ -0,0 +1,106 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import literal, null, select
+from typing import Literal, Optional
+from datetime import datetime
+import csv
+import io
+import json
+import logging
+
+from app import categories
+from app.replica import read_session_scope
+from app.models import Expense, Income, Saving, User
+from app.auth_utils import get_current_user
+from app.instrumentation import query_budget
+
+router = APIRouter(prefix="/export", tags=["Export"])
+logger = logging.getLogger(__name__)
+
+# Rows are pulled from a server-side cursor this many at a time, so memory stays flat
+EXPORT_BATCH_SIZE = 2000
+
+EXPORT_COLUMNS = ["type", "id", "timestamp", "amount", "category", "note"]
+
+# (value of the "type" column, model, note column, category column)
+LEDGERS = [
+    ("expense", Expense, Expense.Note, categories.CATEGORY_NAME),
+    ("income", Income, Income.note, None),
+    ("saving", Saving, Saving.note, None),
+]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _ledger_query(kind, model, note_column, category_column, user_id, start, end):
+    stmt = select(
+        literal(kind).label("type"),
+        model.id,
+        model.timestamp,
+        model.amount,
+        (category_column if category_column is not None else null()).label("category"),
+        note_column.label("note"),
+    ).where(model.user_id == user_id)
+    if category_column is not None:
+        stmt = categories.join_names(stmt)
+    if start is not None:
+        stmt = stmt.where(model.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(model.timestamp <= end)
+    return stmt.order_by(model.timestamp, model.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+def _encode_csv(rows, header=False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([row.type, row.id, row.timestamp.isoformat(), row.amount, row.category or "", row.note or ""])
+    return buffer.getvalue()
+
+
+def _encode_ndjson(rows) -> str:
+    return "".join(
+        json.dumps({
+            "type": row.type,
+            "id": row.id,
+            "timestamp": row.timestamp.isoformat(),
+            "amount": row.amount,
+            "category": row.category,
+            "note": row.note,
+        }) + "\n"
+        for row in rows
+    )
+
+
+async def _export_stream(user_id: int, fmt: str, start, end):
+    # The request's own session is closed before the body is streamed, so open a dedicated one
+    async with read_session_scope(user_id) as db:
+        if fmt == "csv":
+            yield _encode_csv([], header=True)
+        for kind, model, note_column, category_column in LEDGERS:
+            result = await db.stream(_ledger_query(kind, model, note_column, category_column, user_id, start, end))
+            async for partition in result.partitions():
+                yield _encode_csv(partition) if fmt == "csv" else _encode_ndjson(partition)
+
+
+@router.get("", dependencies=[Depends(query_budget(4))])
+async def export_ledger(
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    current_user: User = Depends(get_current_user)
+):
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="Invalid date range: from cannot be after to")
+
+    logger.info(f"User {current_user.id} started a {format} export from {start} to {end}")
+    return StreamingResponse(
+        _export_stream(current_user.id, format, start, end),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="ledger.{format}"'},
+    )
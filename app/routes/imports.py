@@ -0,0 +1,199 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import ValidationError
+from typing import Literal, Optional
+from datetime import datetime, timezone
+import csv
+import io
+import itertools
+import json
+import logging
+
+from app import bulk, categories, ledger
+from app.database import get_db
+from app.models import Expense, Income, Saving, User
+from app.schemas import ExpenseCreate, IncomeCreate, SavingCreate, ImportResult
+from app.auth_utils import get_current_user
+from app.instrumentation import extend_query_budget, query_budget
+
+router = APIRouter(prefix="/import", tags=["Import"])
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+MAX_CHUNK_SIZE = 50000
+MAX_REPORTED_ERRORS = 1000
+
+# statements one chunk may run, on top of the request's principal lookup: for expenses the category
+# lookup, SAVEPOINT + INSERT + RELEASE and a re-read for new categories, the bulk load, and the
+# rollup and snapshot upserts (8); for incomes and for savings the bulk load and the two upserts (3 each)
+CHUNK_QUERY_BUDGET = 14
+
+# value of the "type" column -> (create schema, model)
+IMPORT_TYPES = {
+    "expense": (ExpenseCreate, Expense),
+    "income": (IncomeCreate, Income),
+    "saving": (SavingCreate, Saving),
+}
+
+
+def _read_rows(upload: UploadFile, fmt: str):
+    """
+    Yields (row number, dict) from the upload. Accepts the same layout GET /export produces.
+    """
+    upload.file.seek(0)
+    text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            for number, row in enumerate(csv.DictReader(text), start=1):
+                yield number, row
+            return
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = {"__error__": f"invalid JSON: {e}"}
+            yield number, row if isinstance(row, dict) else {"__error__": "each line must be a JSON object"}
+    finally:
+        text.detach()  # keep the upload open for the next pass
+
+
+def _parse_timestamp(value):
+    if value in (None, ""):
+        return None
+    ts = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    # Stored and bucketed into months in UTC, like the rest of the ledger
+    return ts.astimezone(timezone.utc) if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def _validate(raw: dict, default_type: Optional[str], now: datetime):
+    """
+    (model, column values) for one uploaded row; raises ValueError with the list of problems.
+    """
+    if "__error__" in raw:
+        raise ValueError([raw["__error__"]])
+
+    kind = raw.get("type") or default_type
+    if kind not in IMPORT_TYPES:
+        raise ValueError([f"type: must be one of {', '.join(IMPORT_TYPES)}"])
+    schema, model = IMPORT_TYPES[kind]
+
+    note = raw.get("note", raw.get("Note")) or None
+    fields = {"amount": raw.get("amount")}
+    if kind == "expense":
+        fields.update(category=raw.get("category"), Note=note)
+    else:
+        fields.update(note=note)
+
+    problems = []
+    try:
+        values = schema(**fields).dict()
+    except ValidationError as e:
+        problems += [f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()]
+    try:
+        timestamp = _parse_timestamp(raw.get("timestamp"))
+    except ValueError:
+        problems.append("timestamp: invalid ISO 8601 datetime")
+    if problems:
+        raise ValueError(problems)
+
+    values["timestamp"] = timestamp or now
+    return model, values
+
+
+def _check_upload(upload: UploadFile, fmt: str, default_type: Optional[str], now: datetime):
+    """
+    First pass: decode and validate every row without writing anything. (failed, errors).
+    Raises UnicodeDecodeError if the upload isn't UTF-8.
+    """
+    failed = 0
+    errors = []
+    for number, raw in _read_rows(upload, fmt):
+        try:
+            _validate(raw, default_type, now)
+        except ValueError as e:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": number, "errors": e.args[0]})
+    return failed, errors
+
+
+def _valid_rows(upload: UploadFile, fmt: str, default_type: Optional[str], now: datetime):
+    """
+    Second pass: yields (model, column values) for the valid rows; invalid ones were reported by _check_upload.
+    """
+    for _, raw in _read_rows(upload, fmt):
+        try:
+            yield _validate(raw, default_type, now)
+        except ValueError:
+            continue
+
+
+def _next_chunk(rows, size: int) -> dict:
+    """
+    {model: [column values]} for up to `size` rows taken from `rows`.
+    """
+    batches = {model: [] for _, model in IMPORT_TYPES.values()}
+    for model, values in itertools.islice(rows, size):
+        batches[model].append(values)
+    return batches
+
+
+async def _load(db: AsyncSession, user_id: int, batches: dict):
+    for model, rows in batches.items():
+        if not rows:
+            continue
+        for row in rows:
+            row["user_id"] = user_id
+        if model is Expense:
+            rows = await categories.encode_rows(db, user_id, rows)
+        await bulk.bulk_load(db, model, rows)
+        await ledger.record_rows(db, user_id, model.__tablename__, rows)
+
+
+@router.post("", response_model=ImportResult, dependencies=[Depends(query_budget(1))])
+async def import_ledger(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="defaults to the file extension"),
+    type: Optional[Literal["expense", "income", "saving"]] = Query(None, description="for rows without a type column"),
+    atomic: bool = Query(True, description="all-or-nothing; when false each chunk's valid rows are committed on their own"),
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=MAX_CHUNK_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    fmt = format or ("ndjson" if (file.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv")
+    now = datetime.now(timezone.utc)
+
+    # Parsing and validation are CPU-bound, so both passes run on the threadpool, not the event loop.
+    # The whole upload is checked before anything is written: a bad encoding is rejected with no rows
+    # committed, and an atomic import with invalid rows never touches the database (not even to
+    # create the categories its rows name).
+    try:
+        failed, errors = await run_in_threadpool(_check_upload, file, fmt, type, now)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Upload must be UTF-8 encoded")
+
+    imported = 0
+    committed = not (atomic and failed)
+    if committed:
+        rows = _valid_rows(file, fmt, type, now)
+        while True:
+            batches = await run_in_threadpool(_next_chunk, rows, chunk_size)
+            count = sum(len(batch) for batch in batches.values())
+            if not count:
+                break
+            extend_query_budget(CHUNK_QUERY_BUDGET)
+            await _load(db, current_user.id, batches)
+            if not atomic:
+                await db.commit()
+            imported += count
+        if atomic:
+            await db.commit()
+
+    logger.info(
+        f"User {current_user.id} imported {imported} rows from {file.filename} "
+        f"({failed} invalid, atomic={atomic})"
+    )
+    return {"imported": imported, "failed": failed, "committed": committed, "errors": errors}
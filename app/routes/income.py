@@ -1,35 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
 from app.models import Income, User
-from app.schemas import IncomeCreate, IncomeResponse
+from app.schemas import IncomeCreate, IncomeResponse, IncomePage
 from app.database import get_db
+from app.replica import get_read_db
 from app.auth_utils import get_current_user
+from app.instrumentation import query_budget
+from app import ledger, crud, fastjson
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, split_page
 
 router = APIRouter(prefix="/income", tags=["Income"])
 logger = logging.getLogger(__name__)
 
-@router.post("/", response_model=IncomeResponse)
-def create_income(
+# columns selected for the list endpoint, in IncomeResponse field order
+INCOME_FIELDS, INCOME_COLUMNS = fastjson.schema_columns(Income, IncomeResponse)
+
+@router.post("/", response_model=IncomeResponse, dependencies=[Depends(query_budget(5))])
+async def create_income(
     income: IncomeCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     new_income = Income(**income.dict(), user_id=current_user.id)
     db.add(new_income)
-    db.commit()
-    db.refresh(new_income)
+    await db.flush()
+    await ledger.record(db, new_income)
+    await db.commit()
+    await db.refresh(new_income)
 
     logger.info(f"User {current_user.id} created income: {new_income.amount} at {new_income.timestamp}")
     return new_income
 
 
-@router.get("/", response_model=list[IncomeResponse])
-def get_all_income(
-    db: Session = Depends(get_db),
+# (principal, INSERT ... RETURNING (one per row on SQLite, see crud.create_ledger_rows), rollup and
+#  snapshot upserts; rows all get the server's timestamp, so one month)
+@router.post("/batch", response_model=list[IncomeResponse], dependencies=[Depends(query_budget(4))])
+async def create_income_batch(
+    incomes: list[IncomeCreate] = Body(..., min_length=1, max_length=crud.BATCH_MAX_RECORDS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    created = await crud.create_ledger_rows(db, Income, current_user.id, [i.dict() for i in incomes])
+    logger.info(f"User {current_user.id} created {len(created)} income records in one batch")
+    return created
+
+
+@router.get("/", response_model=IncomePage, dependencies=[Depends(query_budget(2))])
+async def get_all_income(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    incomes = db.query(Income).filter(Income.user_id == current_user.id).order_by(Income.timestamp.desc()).all()
+    result = await db.execute(crud.ledger_page_query(Income, INCOME_COLUMNS, current_user.id, limit, cursor))
+    incomes, next_cursor = split_page(result.all(), limit)
     logger.info(f"User {current_user.id} fetched {len(incomes)} income records")
-    return incomes
+    return fastjson.page_response(incomes, INCOME_FIELDS, next_cursor)
@@ -1,36 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import logging
 
-from app import models, schemas
+from app import models, schemas, ledger, crud, fastjson
 from app.database import get_db
+from app.replica import get_read_db
 from app.auth_utils import get_current_user
+from app.instrumentation import query_budget
 from app.models import User
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, split_page
 
 router = APIRouter(prefix="/saving", tags=["Saving"])
 logger = logging.getLogger(__name__)
 
-@router.post("/", response_model=schemas.Saving)
-def create_saving(
+# columns selected for the list endpoint, in schemas.Saving field order
+SAVING_FIELDS, SAVING_COLUMNS = fastjson.schema_columns(models.Saving, schemas.Saving)
+
+@router.post("/", response_model=schemas.Saving, dependencies=[Depends(query_budget(5))])
+async def create_saving(
     saving: schemas.SavingCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     new_saving = models.Saving(**saving.dict(), user_id=current_user.id)
     db.add(new_saving)
-    db.commit()
-    db.refresh(new_saving)
+    await db.flush()
+    await ledger.record(db, new_saving)
+    await db.commit()
+    await db.refresh(new_saving)
 
     logger.info(f"User {current_user.id} created saving: {new_saving.amount} at {new_saving.timestamp}")
     return new_saving
 
 
-@router.get("/", response_model=List[schemas.Saving])
-def get_all_saving(
-    db: Session = Depends(get_db),
+# (principal, INSERT ... RETURNING (one per row on SQLite, see crud.create_ledger_rows), rollup and
+#  snapshot upserts; rows all get the server's timestamp, so one month)
+@router.post("/batch", response_model=List[schemas.Saving], dependencies=[Depends(query_budget(4))])
+async def create_saving_batch(
+    savings: List[schemas.SavingCreate] = Body(..., min_length=1, max_length=crud.BATCH_MAX_RECORDS),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    created = await crud.create_ledger_rows(db, models.Saving, current_user.id, [s.dict() for s in savings])
+    logger.info(f"User {current_user.id} created {len(created)} saving records in one batch")
+    return created
+
+
+@router.get("/", response_model=schemas.SavingPage, dependencies=[Depends(query_budget(2))])
+async def get_all_saving(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    savings = db.query(models.Saving).filter(models.Saving.user_id == current_user.id).order_by(models.Saving.timestamp.desc()).all()
+    result = await db.execute(crud.ledger_page_query(models.Saving, SAVING_COLUMNS, current_user.id, limit, cursor))
+    savings, next_cursor = split_page(result.all(), limit)
     logger.info(f"User {current_user.id} retrieved {len(savings)} saving records")
-    return savings
+    return fastjson.page_response(savings, SAVING_FIELDS, next_cursor)
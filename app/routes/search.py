@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Literal, Optional
+from datetime import datetime
+import logging
+
+from app import analytics, search
+from app.auth_utils import get_current_user
+from app.instrumentation import query_budget
+from app.models import User
+from app.replica import get_read_db
+from app.schemas import SearchPage
+
+router = APIRouter(prefix="/search", tags=["Search"])
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+
+# ✅ Search expense and income notes, best match first
+# (on a cold cache with a category filter: principal, category id, then on Postgres the search
+# itself; on SQLite the data version, the in-process index rebuild and the page's category names)
+@router.get("", response_model=SearchPage, dependencies=[Depends(query_budget(5))])
+async def search_notes(
+    q: str = Query(..., min_length=1, max_length=search.MAX_QUERY_LENGTH),
+    type: Optional[Literal["expense", "income"]] = Query(None),
+    category: Optional[str] = Query(None, description="expense category; limits results to expenses"),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    limit: int = Query(DEFAULT_SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Bounds may mix naive (taken as UTC) and offset values; compare and filter them all in UTC
+    start_date = analytics.as_utc(start_date) if start_date else None
+    end_date = analytics.as_utc(end_date) if end_date else None
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="Invalid date range: start_date cannot be after end_date")
+
+    logger.info(f"User {current_user.id} searched notes (type={type}, category={category})")
+    items, next_cursor = await search.search_notes(
+        db, current_user.id, q, kind=type, category=category,
+        start=start_date, end=end_date, limit=limit, cursor=cursor,
+    )
+    return {"items": items, "next_cursor": next_cursor}
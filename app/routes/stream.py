@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+import json
+import logging
+
+from app import auth_utils, live
+from app.auth_utils import get_current_user
+from app.models import User
+
+router = APIRouter(tags=["Live"])
+logger = logging.getLogger(__name__)
+
+
+def _bearer_token(authorization: Optional[str]) -> Optional[str]:
+    scheme, _, token = (authorization or "").partition(" ")
+    return token if scheme.lower() == "bearer" and token else None
+
+
+async def _wait_for_disconnect(websocket: WebSocket):
+    # Clients don't send anything; reading is only how a closed socket is noticed
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+# ✅ Live balance and current-month totals over a WebSocket
+@router.websocket("/ws/ledger")
+async def ledger_socket(websocket: WebSocket, token: Optional[str] = Query(None)):
+    # Browsers can't set headers on the handshake, so the token may also come as ?token=
+    try:
+        current_user = await auth_utils.authenticate_token(token or _bearer_token(websocket.headers.get("authorization")))
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    logger.info(f"User {current_user.id} opened a live ledger socket")
+    disconnected = asyncio.create_task(_wait_for_disconnect(websocket))
+    try:
+        async with live.subscription(current_user.id, "websocket") as subscription:
+            while True:
+                next_event = asyncio.create_task(subscription.get())
+                await asyncio.wait({next_event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done():
+                    next_event.cancel()
+                    break
+                await websocket.send_json(next_event.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
+        logger.info(f"User {current_user.id} closed a live ledger socket")
+
+
+async def _event_stream(user_id: int):
+    async with live.subscription(user_id, "sse") as subscription:
+        while True:
+            try:
+                payload = await asyncio.wait_for(subscription.get(), live.LIVE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"  # comment line; keeps proxies from closing an idle stream
+                continue
+            yield f"event: ledger\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+# ✅ The same events as Server-Sent Events, for clients that prefer plain HTTP
+@router.get("/ledger/stream")
+async def ledger_stream(current_user: User = Depends(get_current_user)):
+    logger.info(f"User {current_user.id} opened a live ledger stream")
+    return StreamingResponse(
+        _event_stream(current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
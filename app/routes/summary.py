@@ -1,74 +1,46 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import extract, func
-from app.database import get_db
-from app import models
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.replica import get_read_db
+from app import crud, models
 from app.schemas import MonthlySummary
 from datetime import date
-import calendar
 import logging
 from app.auth_utils import get_current_user
 from app.models import User
+from app.http_cache import conditional_get
+from app.instrumentation import query_budget
 
 router = APIRouter(prefix="/summary", tags=["Summary"])
 
 logger = logging.getLogger(__name__)
 
-@router.get("/monthly")
-def get_monthly_summary(
-    db: Session = Depends(get_db),
+@router.get("/monthly", dependencies=[Depends(query_budget(3))])
+async def get_monthly_summary(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     logger.info(f"User {current_user.id} requested monthly summary")
+    return await conditional_get(
+        request, response, db, current_user.id, "summary/monthly", (),
+        lambda: _monthly_summary(db, current_user.id),
+    )
 
-    # Get unique months from all tables for the current user
-    months_income = db.query(
-        extract('year', models.Income.timestamp).label("year"),
-        extract('month', models.Income.timestamp).label("month")
-    ).filter(models.Income.user_id == current_user.id).distinct()
-
-    months_expense = db.query(
-        extract('year', models.Expense.timestamp).label("year"),
-        extract('month', models.Expense.timestamp).label("month")
-    ).filter(models.Expense.user_id == current_user.id).distinct()
-
-    months_saving = db.query(
-        extract('year', models.Saving.timestamp).label("year"),
-        extract('month', models.Saving.timestamp).label("month")
-    ).filter(models.Saving.user_id == current_user.id).distinct()
-
-    all_months_set = {
-        (int(m.year), int(m.month)) for m in
-        list(months_income) + list(months_expense) + list(months_saving)
-    }
-
-    results = []
 
-    for year, month in sorted(all_months_set, reverse=True):
-        month_label = f"{year}-{str(month).zfill(2)}"
-        logger.info(f"Processing summary for {month_label} for user {current_user.id}")
+async def _monthly_summary(db: AsyncSession, user_id: int):
+    # One indexed range read over the per-user rollups kept up to date by app/ledger.py
+    result = await db.execute(crud.monthly_rollups_query(user_id))
+    rollups = result.scalars().all()
 
-        income = db.query(func.sum(models.Income.amount)).filter(
-            extract('year', models.Income.timestamp) == year,
-            extract('month', models.Income.timestamp) == month,
-            models.Income.user_id == current_user.id
-        ).scalar()
-
-        expense = db.query(func.sum(models.Expense.amount)).filter(
-            extract('year', models.Expense.timestamp) == year,
-            extract('month', models.Expense.timestamp) == month,
-            models.Expense.user_id == current_user.id
-        ).scalar()
+    results = []
 
-        saving = db.query(func.sum(models.Saving.amount)).filter(
-            extract('year', models.Saving.timestamp) == year,
-            extract('month', models.Saving.timestamp) == month,
-            models.Saving.user_id == current_user.id
-        ).scalar()
+    for rollup in rollups:
+        month_label = rollup.month.strftime("%Y-%m")
 
-        income_val = round(income, 2) if income else "-"
-        expense_val = round(expense, 2) if expense else "-"
-        saving_val = round(saving, 2) if saving else "-"
+        income_val = round(rollup.income, 2) if rollup.income else "-"
+        expense_val = round(rollup.expense, 2) if rollup.expense else "-"
+        saving_val = round(rollup.saving, 2) if rollup.saving else "-"
 
         if all(isinstance(v, (int, float)) for v in [income_val, expense_val, saving_val]):
             balance = round(income_val - expense_val - saving_val, 2)
@@ -86,10 +58,12 @@ def get_monthly_summary(
     return results
 
 
-@router.get("/monthly/{month}", response_model=MonthlySummary)
-def get_summary_for_month(
+@router.get("/monthly/{month}", response_model=MonthlySummary, dependencies=[Depends(query_budget(3))])
+async def get_summary_for_month(
     month: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -97,25 +71,24 @@ def get_summary_for_month(
     """
     logger.info(f"User {current_user.id} requested summary for month: {month}")
 
-    year, month_num = map(int, month.split("-"))
-    start_date = date(year, month_num, 1)
-    last_day = calendar.monthrange(year, month_num)[1]
-    end_date = date(year, month_num, last_day)
-
-    income = db.query(func.sum(models.Income.amount)).filter(
-        models.Income.timestamp.between(start_date, end_date),
-        models.Income.user_id == current_user.id
-    ).scalar()
-
-    expense = db.query(func.sum(models.Expense.amount)).filter(
-        models.Expense.timestamp.between(start_date, end_date),
-        models.Expense.user_id == current_user.id
-    ).scalar()
-
-    saving = db.query(func.sum(models.Saving.amount)).filter(
-        models.Saving.timestamp.between(start_date, end_date),
-        models.Saving.user_id == current_user.id
-    ).scalar()
+    try:
+        year, month_num = map(int, month.split("-"))
+        month_start = date(year, month_num, 1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid month format, expected YYYY-MM")
+
+    return await conditional_get(
+        request, response, db, current_user.id, "summary/monthly/{month}", (month,),
+        lambda: _summary_for_month(db, current_user.id, month, month_start),
+    )
+
+
+async def _summary_for_month(db: AsyncSession, user_id: int, month: str, month_start: date):
+    rollup = await db.get(models.MonthlyRollup, (user_id, month_start))
+
+    income = rollup.income if rollup else None
+    expense = rollup.expense if rollup else None
+    saving = rollup.saving if rollup else None
 
     return {
         "month": month,
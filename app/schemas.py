@@ -28,9 +28,15 @@ class Expenseout(BaseModel):
     class Config:
         from_attributes = True
 
+class ExpensePage(BaseModel):
+    items: List[Expenseout]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= to get the next page
+
 class ExpenseSummary(BaseModel):
     total_amount: float
-    expenses: List[Expenseout]
+    count: int = 0                     # matching expenses over the whole range, not just this page
+    expenses: List[Expenseout]         # one page, newest first; empty with totals_only=true
+    next_cursor: Optional[str] = None
     message: Optional[str] = None
 
     class Config:
@@ -63,7 +69,9 @@ class ExpensesByCategoryRequest(BaseModel):
 
 class ExpensesByCategoryResponse(BaseModel):
     total_amount: float
+    count: int = 0
     expenses: List[Expenseout]
+    next_cursor: Optional[str] = None
 
 # ---------------- Income Schemas ----------------
 class IncomeBase(BaseModel):
@@ -80,6 +88,10 @@ class IncomeResponse(IncomeBase):
     class Config:
         orm_mode = True
 
+class IncomePage(BaseModel):
+    items: List[IncomeResponse]
+    next_cursor: Optional[str] = None
+
 # ---------------- Saving Schemas ----------------
 class SavingBase(BaseModel):
     amount: float
@@ -103,6 +115,10 @@ class Saving(SavingCreate):
     class Config:
         orm_mode = True
 
+class SavingPage(BaseModel):
+    items: List[Saving]
+    next_cursor: Optional[str] = None
+
 
 # ---------------- summary Schemas ----------------
 
@@ -115,6 +131,37 @@ class MonthlySummary(BaseModel):
     balance: Union[float, str]
 
 
+# ---------------- import Schemas ----------------
+
+
+class ImportRowError(BaseModel):
+    row: int  # 1-based data row number in the uploaded file
+    errors: List[str]
+
+class ImportResult(BaseModel):
+    imported: int
+    failed: int
+    committed: bool
+    errors: List[ImportRowError]  # capped, see MAX_REPORTED_ERRORS in app/routes/imports.py
+
+
+# ---------------- search Schemas ----------------
+
+
+class SearchResult(BaseModel):
+    type: str  # "expense" or "income"
+    id: int
+    timestamp: datetime
+    amount: float
+    category: Optional[str] = None  # expenses only
+    note: Optional[str] = None
+    score: float
+
+class SearchPage(BaseModel):
+    items: List[SearchResult]  # best match first
+    next_cursor: Optional[str] = None
+
+
 # ---------------- auth/user Schemas ----------------
 
 
@@ -0,0 +1,272 @@
+# search.py
+# Ranked search over a user's expense notes (Expense.Note) and income notes (Income.note).
+#
+# On Postgres a note matches when its tsvector matches websearch_to_tsquery(q), or when q is
+# word-similar to it under pg_trgm (typos, partial words). The score is ts_rank + word_similarity.
+# Both conditions are served by the GIN indexes of migration a9d3e6f2c8b4.
+# Other databases (SQLite in development) use an in-process inverted index over the same notes,
+# with the same kind of trigram fuzziness. It is built on first search and cached per
+# (user, data version): any ledger write bumps the version (app/ledger.py), so a stale index is
+# never used again and just ages out of the LRU.
+#
+# Results are ordered by score, which is not a stable key, so pages continue from an offset
+# carried in an opaque cursor rather than a keyset position.
+import base64
+import os
+import re
+from collections import defaultdict, namedtuple
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import func, literal, literal_column, null, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import analytics, categories, metrics
+from app.cache import LRUCache
+from app.http_cache import data_version
+from app.models import Expense, Income, note_tsvector
+
+SEARCH_INDEX_CACHE_SIZE = int(os.getenv("SEARCH_INDEX_CACHE_SIZE", "256"))
+
+# pg_trgm's default similarity threshold, used by the in-process index as well
+TRIGRAM_THRESHOLD = 0.3
+
+MAX_QUERY_LENGTH = 200
+
+_WORD = re.compile(r"\w+")
+
+_indexes = LRUCache(maxsize=SEARCH_INDEX_CACHE_SIZE, ttl=None)  # (user_id, version) -> NoteIndex
+
+
+@metrics.register_collector
+def _search_index_metrics():
+    stats = _indexes.stats()
+    for stat, type_name in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("size", "gauge")):
+        suffix = "_total" if type_name == "counter" else ""
+        yield from metrics.sample_lines(
+            f"search_index_cache_{stat}{suffix}",
+            f"In-process note search index cache {stat}",
+            [({}, stats[stat])],
+            type_name=type_name,
+        )
+
+
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(f"o{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        if raw[:1] != "o":
+            raise ValueError(raw)
+        offset = int(raw[1:])
+        if offset < 0:
+            raise ValueError(raw)
+        return offset
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# ---------------- Postgres ----------------
+
+def _ledger_matches(kind, model, note_column, category_column, user_id, q, start, end):
+    query = func.websearch_to_tsquery(literal_column("'simple'"), q)
+    document = note_tsvector(note_column)
+    stmt = select(
+        literal(kind).label("type"),
+        model.id,
+        model.timestamp,
+        model.amount,
+        (category_column if category_column is not None else null()).label("category"),
+        note_column.label("note"),
+        (func.ts_rank(document, query) + func.word_similarity(q, note_column)).label("score"),
+    ).where(
+        model.user_id == user_id,
+        or_(document.op("@@")(query), literal(q).op("<%")(note_column)),
+    )
+    if category_column is not None:
+        stmt = categories.join_names(stmt)
+    if start is not None:
+        stmt = stmt.where(model.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(model.timestamp <= end)
+    return stmt
+
+
+async def _search_postgres(db, user_id, q, kinds, category_id, start, end, limit, offset):
+    selects = []
+    if "expense" in kinds:
+        stmt = _ledger_matches("expense", Expense, Expense.Note, categories.CATEGORY_NAME, user_id, q, start, end)
+        if category_id is not None:
+            stmt = stmt.where(Expense.category_id == category_id)
+        selects.append(stmt)
+    if "income" in kinds:
+        selects.append(_ledger_matches("income", Income, Income.note, None, user_id, q, start, end))
+
+    matches = union_all(*selects).subquery() if len(selects) > 1 else selects[0].subquery()
+    result = await db.execute(
+        select(matches)
+        .order_by(matches.c.score.desc(), matches.c.timestamp.desc(), matches.c.id.desc())
+        .offset(offset)
+        .limit(limit + 1)
+    )
+    return [row._asdict() for row in result.all()]
+
+
+# ---------------- in-process index ----------------
+
+_Note = namedtuple("_Note", "type id timestamp amount category_id note")
+
+
+def _tokens(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+def _trigrams(token: str) -> set[str]:
+    # pg_trgm pads each word with two spaces in front and one behind
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NoteIndex:
+    """
+    Inverted index over one user's expense and income notes at one data version.
+    """
+
+    def __init__(self, notes: list):
+        self.notes = notes
+        self.postings = defaultdict(set)    # token -> positions in notes
+        self.by_trigram = defaultdict(set)  # trigram -> tokens
+        for position, entry in enumerate(notes):
+            for token in _tokens(entry.note):
+                self.postings[token].add(position)
+        for token in self.postings:
+            for trigram in _trigrams(token):
+                self.by_trigram[trigram].add(token)
+
+    def _similar_tokens(self, query_token: str) -> dict:
+        """
+        {indexed token: similarity} for the tokens matching `query_token` exactly, by prefix or
+        by trigram similarity above TRIGRAM_THRESHOLD.
+        """
+        grams = _trigrams(query_token)
+        candidates = set()
+        for gram in grams:
+            candidates |= self.by_trigram.get(gram, set())
+        similar = {}
+        for token in candidates:
+            if token == query_token:
+                similar[token] = 1.0
+            elif token.startswith(query_token):
+                similar[token] = 0.9
+            else:
+                other = _trigrams(token)
+                similarity = len(grams & other) / len(grams | other)
+                if similarity >= TRIGRAM_THRESHOLD:
+                    similar[token] = similarity
+        return similar
+
+    def scores(self, q: str) -> dict:
+        """
+        {position: score in (0, 1]}: the mean over the query's words of the best match in each note.
+        """
+        query_tokens = _tokens(q)
+        if not query_tokens:
+            return {}
+        totals = defaultdict(float)
+        for query_token in query_tokens:
+            best = {}
+            for token, similarity in self._similar_tokens(query_token).items():
+                for position in self.postings[token]:
+                    if similarity > best.get(position, 0.0):
+                        best[position] = similarity
+            for position, similarity in best.items():
+                totals[position] += similarity
+        return {position: total / len(query_tokens) for position, total in totals.items()}
+
+
+async def _load_index(db: AsyncSession, user_id: int) -> NoteIndex:
+    result = await db.execute(union_all(
+        select(literal("expense"), Expense.id, Expense.timestamp, Expense.amount, Expense.category_id, Expense.Note)
+        .where(Expense.user_id == user_id, Expense.Note.is_not(None)),
+        select(literal("income"), Income.id, Income.timestamp, Income.amount, null(), Income.note)
+        .where(Income.user_id == user_id, Income.note.is_not(None)),
+    ))
+    # SQLite hands timestamps back naive; they are stored in UTC
+    return NoteIndex([
+        _Note(kind, id, analytics.as_utc(timestamp), amount, category_id, note)
+        for kind, id, timestamp, amount, category_id, note in result.all()
+    ])
+
+
+async def _search_in_process(db, user_id, q, kinds, category_id, start, end, limit, offset):
+    key = (user_id, await data_version(db, user_id))
+    index = _indexes.get(key)
+    if index is None:
+        index = await _load_index(db, user_id)
+        _indexes.set(key, index)
+
+    start = analytics.as_utc(start) if start is not None else None
+    end = analytics.as_utc(end) if end is not None else None
+    hits = []
+    for position, score in index.scores(q).items():
+        entry = index.notes[position]
+        if entry.type not in kinds:
+            continue
+        if category_id is not None and entry.category_id != category_id:
+            continue
+        if (start is not None and entry.timestamp < start) or (end is not None and entry.timestamp > end):
+            continue
+        hits.append((score, entry))
+    hits.sort(key=lambda hit: (hit[0], hit[1].timestamp, hit[1].id), reverse=True)
+    page = hits[offset:offset + limit + 1]
+
+    names = await categories.names_for(db, user_id, [e.category_id for _, e in page if e.category_id is not None])
+    return [
+        {
+            "type": entry.type,
+            "id": entry.id,
+            "timestamp": entry.timestamp,
+            "amount": entry.amount,
+            "category": names.get(entry.category_id) if entry.category_id is not None else None,
+            "note": entry.note,
+            "score": round(score, 4),
+        }
+        for score, entry in page
+    ]
+
+
+async def search_notes(
+    db: AsyncSession,
+    user_id: int,
+    q: str,
+    kind: str | None = None,
+    category: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    limit: int = 20,
+    cursor: str | None = None,
+):
+    """
+    (results, next_cursor): one page of the user's expenses and incomes whose note matches `q`,
+    best match first. A category filter only applies to (and so only returns) expenses.
+    """
+    offset = decode_cursor(cursor) if cursor else 0
+    kinds = {kind} if kind else {"expense", "income"}
+    category_id = None
+    if category is not None:
+        kinds.discard("income")
+        category_id = await categories.lookup_id(db, user_id, category)
+        if category_id is None:
+            return [], None  # a category the user never used
+    if not kinds:
+        return [], None
+
+    if db.get_bind().dialect.name == "postgresql":
+        rows = await _search_postgres(db, user_id, q, kinds, category_id, start, end, limit, offset)
+    else:
+        rows = await _search_in_process(db, user_id, q, kinds, category_id, start, end, limit, offset)
+
+    next_cursor = encode_cursor(offset + limit) if len(rows) > limit else None
+    return rows[:limit], next_cursor
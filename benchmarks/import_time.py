@@ -0,0 +1,95 @@
+# import_time.py
+# Cold-start budget for `import app.main`, measured with `python -X importtime` in fresh interpreters.
+#
+#   python -m benchmarks.import_time                  # exit code 1 if over budget
+#   python -m benchmarks.import_time --budget-ms 1200 --runs 7 --top 20
+#
+# Run on every push by .github/workflows/checks.yml. The default budget comes from a measured
+# baseline: medians of 1042-1141 ms over three sets of 7 runs (single runs 860-1323 ms) on
+# Python 3.11 with one CPU, of which ~800 ms is fastapi, sqlalchemy and pydantic alone. 1500 ms
+# leaves room for that noise while still catching an eager import of anything heavy.
+#
+# Two checks:
+#   * the median total import time stays under --budget-ms (IMPORT_TIME_BUDGET_MS)
+#   * modules that are only needed on first use (password hashing, JWT, DB drivers, ...) are not
+#     imported at all, which holds on any machine regardless of how fast it is
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# top-level packages that must not be imported by `import app.main`
+DEFERRED_PACKAGES = (
+    "passlib",
+    "bcrypt",
+    "jose",
+    "cryptography",
+    "ecdsa",
+    "rsa",
+    "psycopg2",
+    "asyncpg",
+    "aiosqlite",
+    "httpx",
+    "numpy",
+)
+
+
+def measure(module: str = "app.main") -> dict:
+    """
+    {module name: (self us, cumulative us)} from one `-X importtime` run in a fresh interpreter.
+    """
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import-time budget for app.main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to report")
+    args = parser.parse_args(argv)
+
+    runs = [measure() for _ in range(args.runs)]
+    totals_ms = [sum(self_us for self_us, _ in modules.values()) / 1000 for modules in runs]
+    median_ms = statistics.median(totals_ms)
+
+    last = runs[-1]
+    top_level = sorted(
+        ((name, cumulative / 1000) for name, (_, cumulative) in last.items() if "." not in name),
+        key=lambda item: item[1],
+        reverse=True,
+    )[: args.top]
+    imported_early = sorted({name.split(".")[0] for name in last} & set(DEFERRED_PACKAGES))
+
+    print(json.dumps({
+        "median_ms": round(median_ms, 1),
+        "runs_ms": [round(total, 1) for total in totals_ms],
+        "budget_ms": args.budget_ms,
+        "slowest_top_level_ms": {name: round(ms, 1) for name, ms in top_level},
+        "deferred_packages_imported": imported_early,
+    }, indent=2))
+
+    failed = False
+    if median_ms > args.budget_ms:
+        print(f"FAIL: importing app.main took {median_ms:.1f} ms, budget is {args.budget_ms:.0f} ms", file=sys.stderr)
+        failed = True
+    if imported_early:
+        print(f"FAIL: imported at startup instead of on first use: {', '.join(imported_early)}", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
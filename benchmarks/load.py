@@ -0,0 +1,342 @@
+# load.py
+# In-process load test: drives every router in app/routes through httpx's ASGI transport (no network,
+# no uvicorn) against a database seeded by benchmarks.seed, and prints per-endpoint latency
+# percentiles and throughput as JSON so runs can be diffed across commits.
+#
+#   SQLALCHEMY_DATABASE_URL=postgresql://... python -m benchmarks.load --requests 500 --concurrency 32 > before.json
+#   python -m benchmarks.load --only expenses --requests 2000 --concurrency 64
+#   QUERY_BUDGET_MODE=raise AUTH_CACHE_SIZE=0 CATEGORY_CACHE_SIZE=0 python -m benchmarks.load --fail-on-errors
+#
+# The last form is the query-budget check run by .github/workflows/checks.yml: with cold caches and
+# budgets enforced, any route that runs more statements than its query_budget() answers 500.
+#
+# Endpoints run one after another; within an endpoint, --concurrency requests are in flight at once,
+# each as a random seeded user (tokens are minted directly, so bcrypt only runs for the auth routes).
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite:///bench.db")
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+@dataclass
+class Endpoint:
+    name: str
+    # async (client, user_id, email) -> httpx.Response
+    call: Callable
+    # requests for this endpoint are capped (bcrypt-bound routes)
+    max_requests: int | None = None
+
+
+class Context:
+    """
+    Seeded users, their bearer tokens and ids created during the run (for GET/PUT/DELETE by id).
+    """
+
+    def __init__(self, users: list, rng: random.Random):
+        from app.auth_utils import create_access_token
+
+        self.users = users
+        self.rng = rng
+        self.headers = {
+            user_id: {"Authorization": f"Bearer {create_access_token({'user_id': user_id})}"}
+            for user_id, _ in users
+        }
+        self.expense_ids = {user_id: [] for user_id, _ in users}
+        self.run_id = f"{int(time.time())}{rng.randrange(10**6)}"
+        self.counter = 0
+
+    def user(self):
+        return self.rng.choice(self.users)
+
+    def next_number(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+def _date_range(days: int):
+    end = datetime.now(timezone.utc)
+    return (end - timedelta(days=days)).isoformat(), end.isoformat()
+
+
+def _expense_body(ctx: Context):
+    return {"category": ctx.rng.choice(["food", "rent", "fun"]), "amount": round(ctx.rng.uniform(1, 200), 2), "Note": "load test"}
+
+
+def build_endpoints(ctx: Context) -> list[Endpoint]:
+    from benchmarks.seed import SEED_PASSWORD
+
+    async def create_expense(client, user_id, email):
+        response = await client.post("/expenses/", json=_expense_body(ctx), headers=ctx.headers[user_id])
+        if response.status_code == 200:
+            ctx.expense_ids[user_id].append(response.json()["id"])
+        return response
+
+    async def with_expense_id(client, user_id, fn):
+        if not ctx.expense_ids[user_id]:
+            await create_expense(client, user_id, None)
+        return await fn(ctx.expense_ids[user_id][-1])
+
+    async def get_expense(client, user_id, email):
+        return await with_expense_id(
+            client, user_id, lambda id: client.get(f"/expenses/{id}", headers=ctx.headers[user_id])
+        )
+
+    async def update_expense(client, user_id, email):
+        return await with_expense_id(
+            client, user_id, lambda id: client.put(f"/expenses/{id}", json=_expense_body(ctx), headers=ctx.headers[user_id])
+        )
+
+    async def delete_expense(client, user_id, email):
+        ids = ctx.expense_ids[user_id]
+        if not ids:
+            await create_expense(client, user_id, email)
+        return await client.delete(f"/expenses/{ids.pop()}", headers=ctx.headers[user_id])
+
+    async def import_csv(client, user_id, email):
+        body = "type,amount,category,note\n" + "".join(
+            f"expense,{round(ctx.rng.uniform(1, 200), 2)},food,imported\n" for _ in range(100)
+        )
+        files = {"file": ("ledger.csv", io.BytesIO(body.encode()), "text/csv")}
+        return await client.post("/import", files=files, headers=ctx.headers[user_id])
+
+    async def register(client, user_id, email):
+        number = ctx.next_number()
+        return await client.post("/register", json={
+            "username": f"load{ctx.run_id}_{number}",
+            "email": f"load{ctx.run_id}_{number}@bench.example.com",
+            "password": SEED_PASSWORD,
+        })
+
+    def get(path, params=None):
+        async def call(client, user_id, email):
+            return await client.get(path, params=params() if callable(params) else params, headers=ctx.headers[user_id])
+        return call
+
+    def post(path, body):
+        async def call(client, user_id, email):
+            return await client.post(path, json=body(), headers=ctx.headers[user_id])
+        return call
+
+    month = datetime.now(timezone.utc).strftime("%Y-%m")
+    year_range = lambda: dict(zip(("start_date", "end_date"), _date_range(365)))
+
+    return [
+        Endpoint("GET /", get("/")),
+        # expenses
+        Endpoint("GET /expenses/", get("/expenses/", {"limit": 100})),
+        Endpoint("POST /expenses/", create_expense),
+        Endpoint("POST /expenses/batch", post("/expenses/batch", lambda: [_expense_body(ctx) for _ in range(50)])),
+        Endpoint("GET /expenses/by_date", get("/expenses/by_date", year_range)),
+        Endpoint("GET /expenses/by_date?totals_only", get("/expenses/by_date", lambda: {**year_range(), "totals_only": "true"})),
+        Endpoint("POST /expenses/by_date", post("/expenses/by_date", year_range)),
+        Endpoint("GET /expenses/all_category", get("/expenses/all_category", year_range)),
+        Endpoint("POST /expenses/by-category", post("/expenses/by-category", lambda: {"category": "food", **year_range()})),
+        Endpoint("GET /expenses/{id}", get_expense),
+        Endpoint("PUT /expenses/{id}", update_expense),
+        Endpoint("DELETE /expenses/{id}", delete_expense),
+        # income / saving
+        Endpoint("GET /income/", get("/income/", {"limit": 100})),
+        Endpoint("POST /income/", post("/income/", lambda: {"amount": 2500.0, "note": "load test"})),
+        Endpoint("POST /income/batch", post("/income/batch", lambda: [{"amount": 10.0, "note": "load test"}] * 50)),
+        Endpoint("GET /saving/", get("/saving/", {"limit": 100})),
+        Endpoint("POST /saving/", post("/saving/", lambda: {"amount": 100.0, "note": "load test"})),
+        Endpoint("POST /saving/batch", post("/saving/batch", lambda: [{"amount": 10.0, "note": "load test"}] * 50)),
+        # aggregates
+        Endpoint("GET /balance/", get("/balance/")),
+        Endpoint("GET /summary/monthly", get("/summary/monthly")),
+        Endpoint("GET /summary/monthly/{month}", get(f"/summary/monthly/{month}")),
+        # analytics
+        Endpoint(
+            "GET /analytics/series?bucket=day (5y)",
+            get("/analytics/series", lambda: {"bucket": "day", "window": 30, "start_date": _date_range(5 * 365)[0]}),
+        ),
+        Endpoint("GET /analytics/series?bucket=week&category", get("/analytics/series", {"bucket": "week", "category": "food"})),
+        Endpoint("GET /analytics/categories/stats", get("/analytics/categories/stats", year_range)),
+        Endpoint("GET /search?q=coffee", get("/search", {"q": "coffee"})),
+        Endpoint("GET /search?q=shop (fuzzy)", get("/search", {"q": "shoping", "type": "expense"})),
+        # export / import
+        Endpoint("GET /export?format=csv", get("/export", lambda: {"format": "csv", "from": _date_range(90)[0]})),
+        Endpoint("GET /export?format=ndjson", get("/export", lambda: {"format": "ndjson", "from": _date_range(90)[0]})),
+        Endpoint("POST /import", import_csv),
+        # auth
+        Endpoint("GET /protected", get("/protected")),
+        Endpoint("POST /register", register, max_requests=50),
+        Endpoint(
+            "POST /login",
+            lambda client, user_id, email: client.post("/login", json={"email": email, "password": SEED_PASSWORD}),
+            max_requests=50,
+        ),
+        Endpoint(
+            "POST /token",
+            lambda client, user_id, email: client.post("/token", data={"username": email, "password": SEED_PASSWORD}),
+            max_requests=50,
+        ),
+        # observability
+        Endpoint("GET /metrics", get("/metrics")),
+    ]
+
+
+async def run_endpoint(client, ctx: Context, endpoint: Endpoint, requests: int, concurrency: int) -> dict:
+    requests = min(requests, endpoint.max_requests or requests)
+    latencies = []
+    statuses = {}
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(ctx.user())
+
+    async def worker():
+        while True:
+            try:
+                user_id, email = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await endpoint.call(client, user_id, email)
+                # read the whole body: streaming routes are only done once the last chunk arrived
+                await response.aread()
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - start
+
+    errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+    return {
+        "requests": requests,
+        "errors": errors,
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else None,
+        "mean_ms": round(statistics.fmean(latencies), 3) if latencies else None,
+        "p50_ms": round(_percentile(latencies, 50), 3) if latencies else None,
+        "p95_ms": round(_percentile(latencies, 95), 3) if latencies else None,
+        "p99_ms": round(_percentile(latencies, 99), 3) if latencies else None,
+        "max_ms": round(max(latencies), 3) if latencies else None,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _seeded_users(limit: int) -> list:
+    from sqlalchemy import select
+
+    from app import database
+    from app.models import User
+    from benchmarks.seed import SEED_EMAIL_DOMAIN
+
+    async with database.session_scope() as db:
+        result = await db.execute(
+            select(User.id, User.email)
+            .where(User.email.like(f"%@{SEED_EMAIL_DOMAIN}"), User.username.like("user%"))
+            .order_by(User.id)
+            .limit(limit)
+        )
+        return [tuple(row) for row in result.all()]
+
+
+async def main_async(args) -> dict:
+    import httpx
+
+    from app.main import app
+
+    pattern = re.compile(args.only) if args.only else None
+    results = {}
+    # ASGITransport does not send lifespan events; run the app's lifespan around the whole test
+    async with app.router.lifespan_context(app):
+        users = await _seeded_users(args.users)
+        if not users:
+            raise SystemExit("No seeded users found; run `python -m benchmarks.seed` first.")
+        ctx = Context(users, random.Random(args.seed))
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            for endpoint in build_endpoints(ctx):
+                if pattern and not pattern.search(endpoint.name):
+                    continue
+                if args.warmup:
+                    await run_endpoint(client, ctx, endpoint, args.warmup, args.concurrency)
+                results[endpoint.name] = await run_endpoint(client, ctx, endpoint, args.requests, args.concurrency)
+                summary = results[endpoint.name]
+                print(f"{endpoint.name}: p50={summary['p50_ms']}ms p99={summary['p99_ms']}ms", file=sys.stderr, flush=True)
+
+    return {
+        "commit": _git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "db_mode": os.getenv("DB_MODE", "async"),
+        "database": args.database_label,
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "users": len(users),
+            "seed": args.seed,
+        },
+        "endpoints": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="In-process per-endpoint load test")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight per endpoint")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per endpoint first")
+    parser.add_argument("--users", type=int, default=1000, help="seeded users to spread requests over")
+    parser.add_argument("--only", default=None, help="regex on endpoint names, e.g. 'expenses|balance'")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    parser.add_argument("--fail-on-errors", action="store_true", help="exit with status 1 if any request failed")
+    args = parser.parse_args(argv)
+
+    from sqlalchemy.engine import make_url
+
+    args.database_label = make_url(os.environ["SQLALCHEMY_DATABASE_URL"]).get_backend_name()
+    results = asyncio.run(main_async(args))
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+    failed = {name: summary["statuses"] for name, summary in results["endpoints"].items() if summary["errors"]}
+    for name, statuses in failed.items():
+        print(f"FAIL {name}: {statuses}", file=sys.stderr)
+    return 1 if args.fail_on_errors and failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
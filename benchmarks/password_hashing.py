@@ -0,0 +1,112 @@
+# password_hashing.py
+# Logins per second one worker process can handle, before and after moving bcrypt to its own pool.
+#
+#   python -m benchmarks.password_hashing --rounds 12 --logins 200 --concurrency 64
+#
+# "before" runs verify_password on Starlette's shared threadpool, the way the sync /login route did.
+# "after" runs it through auth_utils.run_password_work. Both phases also time a trivial threadpool
+# call issued during the burst, which stands in for every other sync route sharing that pool.
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite://")
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _probe_threadpool(stop: asyncio.Event, latencies: list):
+    from starlette.concurrency import run_in_threadpool
+
+    while not stop.is_set():
+        start = time.perf_counter()
+        await run_in_threadpool(lambda: None)
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def _run_phase(name: str, verify, logins: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    rejected = 0
+
+    async def one_login():
+        nonlocal rejected
+        async with semaphore:
+            try:
+                await verify()
+            except Exception as e:  # 503 from a saturated password pool
+                if getattr(e, "status_code", None) != 503:
+                    raise
+                rejected += 1
+
+    probe_latencies = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe_threadpool(stop, probe_latencies))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await probe
+
+    completed = logins - rejected
+    return {
+        "phase": name,
+        "logins": logins,
+        "completed": completed,
+        "rejected": rejected,
+        "seconds": round(elapsed, 3),
+        "logins_per_second": round(completed / elapsed, 2) if elapsed else None,
+        "other_route_p50_ms": round(statistics.median(probe_latencies), 3) if probe_latencies else None,
+        "other_route_p99_ms": round(_percentile(probe_latencies, 99), 3) if probe_latencies else None,
+    }
+
+
+async def main_async(args) -> list:
+    from starlette.concurrency import run_in_threadpool
+    from app import auth_utils
+
+    stored_hash = auth_utils.hash_password("benchmark-password")
+
+    async def verify_before():
+        return await run_in_threadpool(auth_utils.verify_password, "benchmark-password", stored_hash)
+
+    async def verify_after():
+        return await auth_utils.verify_and_update_password("benchmark-password", stored_hash)
+
+    return [
+        await _run_phase("before", verify_before, args.logins, args.concurrency),
+        await _run_phase("after", verify_after, args.logins, args.concurrency),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="bcrypt login throughput benchmark")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost (BCRYPT_ROUNDS)")
+    parser.add_argument("--workers", type=int, default=1, help="password pool size (PASSWORD_WORKERS)")
+    parser.add_argument("--queue-limit", type=int, default=1000, help="PASSWORD_QUEUE_LIMIT")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    # auth_utils reads these at import time
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["PASSWORD_WORKERS"] = str(args.workers)
+    os.environ["PASSWORD_QUEUE_LIMIT"] = str(args.queue_limit)
+
+    results = asyncio.run(main_async(args))
+    print(json.dumps({"bcrypt_rounds": args.rounds, "password_workers": args.workers, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# query_plans.py
+# Query-plan regression check: EXPLAINs the per-user time-range queries issued by the routes
+# against a seeded local Postgres and fails if any of them scans a ledger table sequentially, or (once
+# the ledgers are partitioned) if a single-month query is not pruned to that month's partition.
+#
+#   SQLALCHEMY_DATABASE_URL=postgresql://... python -m benchmarks.query_plans [--user-id N]
+#
+# By default the planner is run with enable_seqscan=off, which only falls back to a Seq Scan when no
+# index can serve the query at all; that keeps the check meaningful on small seeded databases.
+# Use --natural-plans on a production-sized dataset to check the plans the planner actually picks.
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, text
+
+LEDGER_TABLES = {"expenses", "incomes", "savings"}
+
+
+def route_queries(user_id: int):
+    # The statements come from the same builders the routes and crud call, so a route that changes
+    # its filters, ordering or joins changes what is EXPLAINed here
+    from app import analytics, categories, crud, search
+    from app.models import Expense, Income, Saving
+    from app.pagination import encode_cursor
+    from app.routes import expenses, export, income, savings
+
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=365)
+    cursor = encode_cursor(end - timedelta(days=30), 2**31 - 1)
+    by_date_totals, by_date_page = crud.expense_range_queries(user_id, start, end, limit=100)
+    by_category_totals, by_category_page = crud.expense_range_queries(user_id, start, end, category_id=1, limit=100)
+
+    return {
+        "GET /expenses/": crud.ledger_page_query(Expense, expenses.EXPENSE_COLUMNS, user_id, 100),
+        "GET /expenses/?cursor": crud.ledger_page_query(Expense, expenses.EXPENSE_COLUMNS, user_id, 100, cursor),
+        "GET /income/": crud.ledger_page_query(Income, income.INCOME_COLUMNS, user_id, 100),
+        "GET /saving/": crud.ledger_page_query(Saving, savings.SAVING_COLUMNS, user_id, 100),
+        "GET /expenses/by_date totals": by_date_totals,
+        "GET /expenses/by_date": by_date_page,
+        "GET /expenses/all_category": crud.category_totals_query(user_id, start, end),
+        "POST /expenses/by-category totals": by_category_totals,
+        "POST /expenses/by-category": by_category_page,
+        # search._search_postgres, expense side
+        "GET /search": search._ledger_matches(
+            "expense", Expense, Expense.Note, categories.CATEGORY_NAME, user_id, "weekly shop", None, None
+        ),
+        "GET /analytics/series": analytics.bucket_totals_query("postgresql", user_id, Expense, "day", start, end),
+        "GET /analytics/categories/stats": analytics.expense_columns_query(user_id, start, end),
+        "GET /export": export._ledger_query(
+            "expense", Expense, Expense.Note, categories.CATEGORY_NAME, user_id, start, None
+        ),
+        "GET /summary/monthly": crud.monthly_rollups_query(user_id),
+        # a one-month range, pruned to a single partition
+        "crud.get_monthly_expenses": crud.monthly_expenses_query(user_id, end),
+    }
+
+
+# route -> most ledger relations (tables or partitions) its plan may touch once partitioned
+MAX_RELATIONS = {
+    "crud.get_monthly_expenses": 1,
+}
+
+
+def _ledger_table(relation: str | None):
+    # partitions (migration e2d5f8a1b396) are named <table>_pYYYY_MM and <table>_default
+    if relation in LEDGER_TABLES:
+        return relation
+    for table in LEDGER_TABLES:
+        if relation and (relation.startswith(f"{table}_p") or relation == f"{table}_default"):
+            return table
+    return None
+
+
+def _seq_scans(plan: dict):
+    if plan.get("Node Type") == "Seq Scan" and _ledger_table(plan.get("Relation Name")):
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from _seq_scans(child)
+
+
+def _relations(plan: dict):
+    if _ledger_table(plan.get("Relation Name")):
+        yield plan["Relation Name"]
+    for child in plan.get("Plans", []):
+        yield from _relations(child)
+
+
+def check_plans(connection, user_id: int, natural_plans: bool = False) -> dict:
+    """
+    {route: [ledger tables/partitions scanned sequentially, or a pruning failure]} for every
+    route query that regressed.
+    """
+    if not natural_plans:
+        connection.execute(text("SET enable_seqscan = off"))
+
+    failures = {}
+    for route, stmt in route_queries(user_id).items():
+        compiled = stmt.compile(connection, compile_kwargs={"literal_binds": True})
+        row = connection.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+        plan = (json.loads(row) if isinstance(row, str) else row)[0]["Plan"]
+        tables = sorted(set(_seq_scans(plan)))
+        relations = sorted(set(_relations(plan)))
+        if route in MAX_RELATIONS and len(relations) > MAX_RELATIONS[route]:
+            tables.append(f"not pruned: {', '.join(relations)}")
+        if tables:
+            failures[route] = tables
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fail if a route query sequentially scans a ledger table")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--natural-plans", action="store_true", help="leave enable_seqscan on")
+    args = parser.parse_args(argv)
+
+    from app.database import SQLALCHEMY_DATABASE_URL
+
+    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    with engine.connect() as connection:
+        failures = check_plans(connection, args.user_id, args.natural_plans)
+    engine.dispose()
+
+    for route, tables in failures.items():
+        print(f"SEQ SCAN  {route}: {', '.join(tables)}")
+    print(f"{len(failures)} route quer{'y' if len(failures) == 1 else 'ies'} fell back to a sequential scan")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
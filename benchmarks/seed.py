@@ -0,0 +1,201 @@
+# seed.py
+# Synthetic data generator for the load tests: users with several years of expenses, income and
+# savings, plus their categories and the monthly_rollups / balance_snapshots rows the ledger
+# would have maintained.
+#
+#   SQLALCHEMY_DATABASE_URL=postgresql://... python -m benchmarks.seed --users 10000 --years 5
+#   SQLALCHEMY_DATABASE_URL=sqlite:///bench.db python -m benchmarks.seed --users 200 --create-schema
+#
+# Rows are generated per chunk of users and written with app.bulk.bulk_load (COPY on Postgres,
+# executemany elsewhere), one transaction per chunk, so memory stays flat at any volume.
+# The output is deterministic for a given --seed. Every seeded user logs in with SEED_PASSWORD.
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite:///bench.db")
+
+SEED_PASSWORD = "benchmark-password"
+SEED_EMAIL_DOMAIN = "bench.example.com"
+
+CATEGORIES = ["food", "rent", "transport", "utilities", "health", "fun", "travel", "gifts", "education", "other"]
+NOTES = [None, None, "weekly shop", "coffee", "monthly bill", "birthday", "online order", "taxi home"]
+
+
+def seed_email(user_id: int) -> str:
+    return f"user{user_id}@{SEED_EMAIL_DOMAIN}"
+
+
+def _month_starts(years: int, end: datetime):
+    first = datetime(end.year - years, end.month, 1, tzinfo=timezone.utc)
+    month = first
+    while month <= end:
+        yield month
+        month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def _random_timestamp(rng: random.Random, month: datetime, end: datetime) -> datetime:
+    next_month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=timezone.utc)
+    span = (min(next_month, end) - month).total_seconds()
+    return month + timedelta(seconds=rng.uniform(0, max(span - 1, 0)))
+
+
+def generate_user_rows(rng: random.Random, user_id: int, months: list, end: datetime, args) -> dict:
+    """
+    {table name: [row dicts]} for one user, including the derived rollup and snapshot rows.
+    """
+    expenses, incomes, savings = [], [], []
+    rollups = defaultdict(lambda: {"income": 0.0, "expense": 0.0, "saving": 0.0, "entries": 0})
+
+    for month in months:
+        totals = rollups[month.date()]
+        for _ in range(max(0, int(rng.gauss(args.expenses_per_month, args.expenses_per_month / 4)))):
+            amount = round(rng.lognormvariate(3, 1), 2)
+            expenses.append({
+                "amount": amount,
+                "category_id": rng.randrange(len(CATEGORIES)) + 1,
+                "Note": rng.choice(NOTES),
+                "timestamp": _random_timestamp(rng, month, end),
+                "user_id": user_id,
+            })
+            totals["expense"] += amount
+            totals["entries"] += 1
+        for _ in range(args.incomes_per_month):
+            amount = round(rng.uniform(1500, 6000), 2)
+            incomes.append({
+                "amount": amount,
+                "note": rng.choice(["salary", "freelance", None]),
+                "timestamp": _random_timestamp(rng, month, end),
+                "user_id": user_id,
+            })
+            totals["income"] += amount
+            totals["entries"] += 1
+        for _ in range(args.savings_per_month):
+            amount = round(rng.uniform(50, 800), 2)
+            savings.append({
+                "amount": amount,
+                "note": rng.choice(["emergency fund", "holiday", None]),
+                "timestamp": _random_timestamp(rng, month, end),
+                "user_id": user_id,
+            })
+            totals["saving"] += amount
+            totals["entries"] += 1
+
+    rollup_rows = [{"user_id": user_id, "month": month, **totals} for month, totals in rollups.items() if totals["entries"]]
+    snapshot = {
+        "user_id": user_id,
+        "total_income": sum(r["income"] for r in rollup_rows),
+        "total_expense": sum(r["expense"] for r in rollup_rows),
+        "total_saving": sum(r["saving"] for r in rollup_rows),
+        "version": 1,
+    }
+    return {
+        "categories": [{"user_id": user_id, "id": index + 1, "name": name} for index, name in enumerate(CATEGORIES)],
+        "expenses": expenses,
+        "incomes": incomes,
+        "savings": savings,
+        "monthly_rollups": rollup_rows,
+        "balance_snapshots": [snapshot],
+    }
+
+
+async def _reset_sequences(db):
+    from sqlalchemy import text
+
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    # users are inserted with explicit ids; move the serial past them
+    await db.execute(text(
+        "SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT COALESCE(MAX(id), 1) FROM users))"
+    ))
+
+
+async def seed(args) -> dict:
+    from sqlalchemy import func, select
+
+    from app import auth_utils, bulk, database
+    from app.models import BalanceSnapshot, Category, Expense, Income, MonthlyRollup, Saving, User
+
+    database.init_engines()
+    if args.create_schema:
+        database.Base.metadata.create_all(bind=database.engine)
+
+    models = {
+        "categories": Category,
+        "expenses": Expense,
+        "incomes": Income,
+        "savings": Saving,
+        "monthly_rollups": MonthlyRollup,
+        "balance_snapshots": BalanceSnapshot,
+    }
+    counts = dict.fromkeys(["users", *models], 0)
+    rng = random.Random(args.seed)
+    end = datetime.now(timezone.utc)
+    months = list(_month_starts(args.years, end))
+    # one bcrypt hash shared by every seeded user; hashing 10k passwords would dominate the run
+    password_hash = auth_utils.hash_password(SEED_PASSWORD)
+
+    start = time.perf_counter()
+    try:
+        async with database.session_scope() as db:
+            first_id = (await db.scalar(select(func.max(User.id))) or 0) + 1
+            for chunk_start in range(first_id, first_id + args.users, args.chunk_users):
+                chunk_ids = range(chunk_start, min(chunk_start + args.chunk_users, first_id + args.users))
+                tables = defaultdict(list)
+                for user_id in chunk_ids:
+                    tables["users"].append({
+                        "id": user_id,
+                        "username": f"user{user_id}",
+                        "email": seed_email(user_id),
+                        "password": password_hash,
+                        "created_at": end - timedelta(days=365 * args.years),
+                    })
+                    for table, rows in generate_user_rows(rng, user_id, months, end, args).items():
+                        tables[table].extend(rows)
+
+                await bulk.bulk_load(db, User, tables.pop("users"))
+                counts["users"] += len(chunk_ids)
+                for table, model in models.items():
+                    rows = tables[table]
+                    for offset in range(0, len(rows), args.batch_rows):
+                        await bulk.bulk_load(db, model, rows[offset:offset + args.batch_rows])
+                    counts[table] += len(rows)
+                await db.commit()
+                print(f"seeded users {chunk_ids.start}..{chunk_ids.stop - 1}", flush=True)
+
+            await _reset_sequences(db)
+            await db.commit()
+    finally:
+        await database.dispose_engines()
+
+    return {
+        "first_user_id": first_id,
+        "rows": counts,
+        "seconds": round(time.perf_counter() - start, 2),
+        "password": SEED_PASSWORD,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a database with synthetic ledger data")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--expenses-per-month", type=int, default=30)
+    parser.add_argument("--incomes-per-month", type=int, default=2)
+    parser.add_argument("--savings-per-month", type=int, default=1)
+    parser.add_argument("--chunk-users", type=int, default=200, help="users generated and committed per transaction")
+    parser.add_argument("--batch-rows", type=int, default=50000, help="rows per COPY / executemany call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--create-schema", action="store_true", help="create_all() instead of relying on alembic")
+    args = parser.parse_args(argv)
+
+    print(json.dumps(asyncio.run(seed(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# serialization.py
+# Micro-benchmark: encoding one large GET /expenses/ page the default FastAPI way
+# (ORM objects -> Pydantic validation -> JSON-mode dump -> json.dumps) versus app.fastjson
+# (column tuples -> dicts -> orjson). Also checks the two produce identical bytes.
+#
+#   python -m benchmarks.serialization --rows 50000 --repeat 5
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite://")
+
+
+def _fake_rows(count: int):
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    categories = ["food", "rent", "travel", "fun", "health", "gifts"]
+    rng = random.Random(42)
+    return [
+        (
+            index + 1,
+            rng.choice([None, "weekly shop", "coffee ☕", 'quote "x"']),
+            round(rng.uniform(0.5, 900.0), 2),
+            rng.choice(categories),
+            start + timedelta(seconds=index * 3607, microseconds=rng.choice([0, 123456])),
+        )
+        for index in range(count)
+    ]
+
+
+def _best_of(repeat: int, fn):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List endpoint serialization micro-benchmark")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+
+    from app import fastjson, schemas
+    from app.models import Expense
+
+    fields, _ = fastjson.schema_columns(Expense, schemas.Expenseout)
+    rows = _fake_rows(args.rows)
+    orm_objects = [Expense(**dict(zip(fields, row))) for row in rows]
+    page_adapter = TypeAdapter(schemas.ExpensePage)
+
+    def default_path():
+        # what FastAPI does with a response_model: validate, dump in JSON mode, stdlib encode
+        page = page_adapter.validate_python({"items": orm_objects, "next_cursor": None}, from_attributes=True)
+        content = jsonable_encoder(page_adapter.dump_python(page, mode="json"))
+        return JSONResponse(content).body
+
+    def fast_path():
+        return fastjson.page_response(rows, fields, None).body
+
+    default_seconds, default_body = _best_of(args.repeat, default_path)
+    fast_seconds, fast_body = _best_of(args.repeat, fast_path)
+
+    print(json.dumps({
+        "rows": args.rows,
+        "bytes": len(fast_body),
+        "identical_output": default_body == fast_body,
+        "default_ms": round(default_seconds * 1000, 2),
+        "fast_ms": round(fast_seconds * 1000, 2),
+        "speedup": round(default_seconds / fast_seconds, 2) if fast_seconds else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()